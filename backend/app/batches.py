@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    """Bookkeeping for one bulk clone submission."""
+
+    def __init__(self, batch_id: str, job_ids: List[str], urls: List[str]):
+        self.id = batch_id
+        self.job_ids = job_ids
+        self.urls = urls
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.job_ids)
+
+    @property
+    def done(self) -> int:
+        return self.completed + self.failed + self.cancelled
+
+    @property
+    def status(self) -> str:
+        if self.done == self.total:
+            return "completed"
+        if self.running or self.done:
+            return "running"
+        return "queued"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "queued": self.total - self.done - self.running,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "progress": int(100 * self.done / self.total) if self.total else 100,
+        }
+
+
+class BatchScheduler:
+    """Feeds batch jobs into the clone queue while capping concurrency per host.
+
+    URLs are grouped by host. A job holds one of its host's ``per_host_limit``
+    slots while it is queued or running, and the slots are shared by all
+    batches, so no origin ever has more than that many batch jobs in flight.
+    Feeders wait for a slot and for space in the queue's batch lane instead of
+    being rejected by admission control.
+    """
+
+    def __init__(self, run_job: Callable[..., Awaitable[str]], per_host_limit: int = 2,
+                 max_batches: int = 100):
+        self.run_job = run_job
+        self.per_host_limit = per_host_limit
+        self.max_batches = max_batches
+        self._batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+
+    def create(self, job_ids: List[str], urls: List[str], *job_args) -> Batch:
+        batch = Batch(str(uuid.uuid4()), job_ids, urls)
+        batch.task = asyncio.create_task(self._run(batch, *job_args))
+        self._batches[batch.id] = batch
+        self._evict()
+        return batch
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        return self._batches.get(batch_id)
+
+    async def stop(self):
+        tasks = [b.task for b in self._batches.values() if b.task and not b.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, batch: Batch, *job_args):
+        by_host: Dict[str, List[int]] = {}
+        for index, url in enumerate(batch.urls):
+            by_host.setdefault(urlsplit(url).netloc.lower(), []).append(index)
+
+        feeders = []
+        for host, indices in by_host.items():
+            pending = iter(indices)
+            for _ in range(min(self.per_host_limit, len(indices))):
+                feeders.append(self._feed(batch, host, pending, *job_args))
+        await asyncio.gather(*feeders)
+        batch.finished_at = time.time()
+        logger.info(f"Batch {batch.id} finished: {batch.completed} completed, {batch.failed} failed, "
+                    f"{batch.cancelled} cancelled")
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str) -> AsyncIterator[None]:
+        """Hold one of the host's slots; a host's semaphore lives only while someone uses it."""
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        try:
+            async with slot:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                del self._host_slots[host]
+
+    async def _feed(self, batch: Batch, host: str, pending, *job_args):
+        # Feeders for the same host share one iterator, so each index runs once
+        for index in pending:
+            async with self._host_slot(host):
+                batch.running += 1
+                try:
+                    status = await self.run_job(batch.job_ids[index], batch.urls[index], *job_args)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Batch {batch.id} job {batch.job_ids[index]} failed: {str(e)}")
+                    status = "failed"
+                finally:
+                    batch.running -= 1
+            if status == "completed":
+                batch.completed += 1
+            elif status == "cancelled":
+                batch.cancelled += 1
+            else:
+                batch.failed += 1
+
+    def _evict(self):
+        while len(self._batches) > self.max_batches:
+            oldest_id, oldest = next(iter(self._batches.items()))
+            if oldest.task and not oldest.task.done():
+                break
+            del self._batches[oldest_id]
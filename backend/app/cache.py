@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def hash_key(*parts: Any) -> str:
+    """Stable sha256 digest of JSON-serializable key parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """Two-tier cache for JSON-serializable values.
+
+    The memory tier is an LRU bounded by entry count and bytes; the optional
+    disk tier stores one JSON file per key and is bounded by total bytes, with
+    its own LRU index rebuilt from file mtimes on startup. Both tiers share a
+    TTL. Keys should already be hashes (see ``hash_key``).
+
+    Called on an event loop, ``put`` writes the disk tier in a worker thread;
+    the memory tier serves the value in the meantime.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = None, disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._pending_writes: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, _, value = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop_memory(key)
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._put_memory(key, value, now)
+        return value
+
+    def put(self, key: str, value: Any):
+        now = time.time()
+        self._put_memory(key, value, now)
+        if self.disk_dir is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_disk(key, value, now)
+            return
+        task = loop.create_task(asyncio.to_thread(self._write_disk, key, value, now))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task):
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"{self.name} cache: disk write failed: {task.exception()}")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._drop_memory(key)
+            if key in self._disk_index:
+                self._drop_disk(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - stored_at > self.ttl_seconds
+
+    def _put_memory(self, key: str, value: Any, stored_at: float):
+        size = len(json.dumps(value, default=str))
+        with self._lock:
+            self._drop_memory(key)
+            self._memory[key] = (stored_at, size, value)
+            self._memory_bytes += size
+            while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+                self._drop_memory(next(iter(self._memory)))
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _load_disk_index(self):
+        entries = []
+        for path in self.disk_dir.glob("*.json"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        if entries:
+            logger.info(f"{self.name} cache: loaded {len(entries)} entries from {self.disk_dir}")
+
+    def _read_disk(self, key: str, now: float) -> Optional[Any]:
+        if self.disk_dir is None:
+            return None
+        with self._lock:
+            if key not in self._disk_index:
+                return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self._drop_disk(key)
+            return None
+        with self._lock:
+            if self._expired(record["stored_at"], now):
+                self._drop_disk(key)
+                return None
+            if key in self._disk_index:
+                self._disk_index.move_to_end(key)
+        os.utime(path, None)
+        return record["value"]
+
+    def _write_disk(self, key: str, value: Any, stored_at: float):
+        path = self._path(key)
+        # Writes run in worker threads, so concurrent writes of one key need their own temp files
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stored_at": stored_at, "value": value}, f)
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+        with self._lock:
+            self._disk_bytes -= self._disk_index.pop(key, 0)
+            self._disk_index[key] = size
+            self._disk_bytes += size
+            while len(self._disk_index) > 1 and self._disk_bytes > self.max_disk_bytes:
+                self._drop_disk(next(iter(self._disk_index)))
+
+    def _drop_disk(self, key: str):
+        size = self._disk_index.pop(key, None)
+        if size is None:
+            return
+        self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
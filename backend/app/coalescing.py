@@ -0,0 +1,86 @@
+import json
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonicalize a URL so equivalent spellings of the same page compare equal."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def coalescing_key(url: str, **options) -> str:
+    """Key identifying identical clone work: normalized URL plus options."""
+    return json.dumps([normalize_url(url), options], sort_keys=True)
+
+
+class RequestCoalescer:
+    """Singleflight registry for in-flight clone pipelines.
+
+    The first job for a key becomes the leader and actually runs; jobs submitted
+    for the same key while it runs become followers that mirror its progress.
+    """
+
+    def __init__(self):
+        self._leaders: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._followers: Dict[str, List[str]] = {}
+        self._detached: Set[str] = set()
+
+    def leader_for(self, key: str) -> Optional[str]:
+        return self._leaders.get(key)
+
+    def lead(self, key: str, job_id: str):
+        self._leaders[key] = job_id
+        self._keys[job_id] = key
+        self._followers[job_id] = []
+
+    def follow(self, leader_id: str, job_id: str):
+        self._followers[leader_id].append(job_id)
+
+    def unfollow(self, leader_id: str, job_id: str):
+        followers = self._followers.get(leader_id)
+        if followers and job_id in followers:
+            followers.remove(job_id)
+
+    def followers(self, leader_id: str) -> List[str]:
+        return self._followers.get(leader_id, [])
+
+    def detach(self, leader_id: str):
+        """Stop mirroring the run into the leader's own job (it was cancelled) while followers still need it.
+
+        The key is dropped too, so new requests start their own run instead of attaching to a cancelled job.
+        """
+        self._detached.add(leader_id)
+        key = self._keys.get(leader_id)
+        if key is not None and self._leaders.get(key) == leader_id:
+            del self._leaders[key]
+
+    def is_detached(self, leader_id: str) -> bool:
+        return leader_id in self._detached
+
+    def targets(self, leader_id: str) -> List[str]:
+        """Job ids that should receive updates from the leader's run."""
+        own = [] if leader_id in self._detached else [leader_id]
+        return own + self.followers(leader_id)
+
+    def release(self, leader_id: str):
+        """Forget a finished leader so the next request for its key starts fresh."""
+        key = self._keys.pop(leader_id, None)
+        if key is not None and self._leaders.get(key) == leader_id:
+            del self._leaders[key]
+        self._followers.pop(leader_id, None)
+        self._detached.discard(leader_id)
+
+    def __len__(self) -> int:
+        return len(self._leaders)
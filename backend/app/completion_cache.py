@@ -0,0 +1,55 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from .cache import TieredCache, hash_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def completion_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int,
+                   system: Optional[str] = None) -> str:
+    """Content hash of everything that determines a completion."""
+    return hash_key(model, system, messages, temperature, max_tokens)
+
+
+class CompletionCache:
+    """Prompt→completion cache in front of the LLM clients.
+
+    Truncated prompts for different sites often come out identical, so the
+    same completion can serve them all. Backed by a ``TieredCache`` whose disk
+    tier survives restarts.
+    """
+
+    def __init__(self, completions: TieredCache):
+        self.completions = completions
+
+    def get(self, key: str) -> Optional[str]:
+        return self.completions.get(key)
+
+    def put(self, key: str, completion: str):
+        if completion:
+            self.completions.put(key, completion)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.completions.stats()
+
+
+_cache: Optional[CompletionCache] = None
+
+
+def get_completion_cache() -> CompletionCache:
+    """Process-wide completion cache shared by every LLM caller, configured through environment variables."""
+    global _cache
+    if _cache is None:
+        completions = TieredCache(
+            "completion",
+            max_entries=int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "5000")),
+            max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) or None,
+            disk_dir=os.getenv("COMPLETION_CACHE_DIR", "data/completion_cache") or None,
+            max_disk_bytes=int(os.getenv("COMPLETION_CACHE_MAX_DISK_BYTES", str(512 * 1024 * 1024))),
+        )
+        _cache = CompletionCache(completions)
+    return _cache
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class JobEventBus:
+    """Fan-out of per-job progress events to Server-Sent Events subscribers.
+
+    Each subscriber gets its own bounded queue. Publishing never blocks: when a
+    slow subscriber's queue is full its backlog is discarded and replaced by a
+    single ``resync`` event. The stream answers that with a fresh status
+    snapshot carrying the partial output, which replaces whatever the client
+    built from the lost deltas; later deltas continue from the snapshot.
+    """
+
+    RESYNC = "resync"
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[job_id]
+
+    def has_subscribers(self, job_id: str) -> bool:
+        return job_id in self._subscribers
+
+    def publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        for queue in self._subscribers.get(job_id, ()):
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                logger.info(f"SSE subscriber of job {job_id} fell behind; sending a fresh snapshot")
+                queue.put_nowait({"event": self.RESYNC, "data": {}})
+            queue.put_nowait({"event": event, "data": data})
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class PartialOutput:
+    """Text streamed so far for each running job, kept as the list of received deltas.
+
+    Deltas are the same string objects the generator receives, so buffering
+    them costs references rather than a second copy of the document. When an
+    artifact finishes, its deltas are replaced by a reference to the final
+    text, which stays readable until the job is cleared.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, Dict[str, List[str]]] = {}
+        self._lengths: Dict[str, Dict[str, int]] = {}
+
+    def append(self, job_id: str, artifact: str, offset: int, text: str) -> bool:
+        """Append a delta at ``offset``; offset 0 restarts the artifact (e.g. after a retry).
+
+        Returns False for a delta that does not continue the buffer.
+        """
+        buffers = self._buffers.setdefault(job_id, {})
+        lengths = self._lengths.setdefault(job_id, {})
+        if offset == 0:
+            buffers[artifact] = []
+            lengths[artifact] = 0
+        if lengths.get(artifact) != offset:
+            return False
+        buffers[artifact].append(text)
+        lengths[artifact] += len(text)
+        return True
+
+    def finish(self, job_id: str, artifact: str, text: str):
+        """Replace an artifact's deltas with its final text."""
+        self._buffers.setdefault(job_id, {})[artifact] = [text]
+        self._lengths.setdefault(job_id, {})[artifact] = len(text)
+
+    def get(self, job_id: str) -> Optional[Dict[str, str]]:
+        buffers = self._buffers.get(job_id)
+        if not buffers:
+            return None
+        return {artifact: "".join(chunks) for artifact, chunks in buffers.items()}
+
+    def clear(self, job_id: str):
+        self._buffers.pop(job_id, None)
+        self._lengths.pop(job_id, None)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional
+
+COUNTERS = (
+    "bytes_downloaded", "prompt_tokens", "completion_tokens", "llm_calls", "llm_retries", "llm_cache_hits",
+    "llm_fallbacks", "llm_hedges", "prompt_cache_read_tokens", "prompt_cache_write_tokens",
+)
+
+
+class JobMetrics:
+    """Per-job wall time by stage plus byte, token and retry counters."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add(self, **counters: int):
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "total_seconds": round(time.monotonic() - self.started, 4),
+            **self.counters,
+        }
+
+
+_current: ContextVar[Optional[JobMetrics]] = ContextVar("job_metrics", default=None)
+
+
+@contextmanager
+def track_job(metrics: JobMetrics) -> Iterator[JobMetrics]:
+    """Make ``metrics`` the target of stage()/record() calls in this context."""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def current_metrics() -> Optional[JobMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block and add it to the current job's stage durations."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name: str, seconds: float):
+    """Add a duration measured elsewhere (e.g. in a worker process) to the current job."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_stage(name, seconds)
+
+
+def record(**counters: int):
+    """Increment counters on the current job, if any."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(**counters)
+
+
+def record_retry(retry_state):
+    """tenacity before_sleep hook counting LLM retries."""
+    record(llm_retries=1)
+
+
+class StageStats:
+    """Rolling window of finished jobs' stage timings for the aggregate view."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._jobs = 0
+        self._lock = threading.Lock()
+
+    def observe(self, metrics: JobMetrics):
+        snapshot = metrics.as_dict()
+        with self._lock:
+            self._jobs += 1
+            for name, seconds in list(snapshot["stages"].items()) + [("total", snapshot["total_seconds"])]:
+                self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            for name in COUNTERS:
+                self._totals[name] += snapshot[name]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: _summarize(list(samples)) for name, samples in self._samples.items()}
+            return {"jobs": self._jobs, "window": self.window, "stages": stages, "totals": dict(self._totals)}
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _summarize(values) -> Dict[str, float]:
+    values.sort()
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(values[-1], 4),
+    }
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected by admission control."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded FIFO of clone jobs drained by a fixed pool of async workers.
+
+    Each submitted job gets a monotonically increasing ticket, so a job's queue
+    position is ``ticket - next ticket to be dequeued`` and can be computed in
+    O(1). Job durations feed an exponentially weighted moving average used to
+    estimate waits; submissions whose estimated wait exceeds the SLO are
+    rejected up front instead of being accepted and timing out later.
+
+    Bulk jobs from ``run`` wait in a separate, lower-priority lane. Workers only
+    take them when no interactive job is waiting, and at most ``batch_workers``
+    run at once, so batches neither count toward interactive admission nor
+    occupy every worker.
+    """
+
+    def __init__(self, handler: Callable[..., Awaitable[Any]], workers: int = 4,
+                 max_depth: int = 100, slo_seconds: float = 600.0,
+                 initial_job_seconds: float = 60.0, smoothing: float = 0.2,
+                 on_skip: Optional[Callable[[str], Any]] = None,
+                 batch_workers: Optional[int] = None):
+        self.handler = handler
+        # Called with the job id when a cancelled job is dropped without reaching the handler
+        self.on_skip = on_skip
+        self.workers = workers
+        self.max_depth = max_depth
+        self.slo_seconds = slo_seconds
+        self.smoothing = smoothing
+        self.avg_job_seconds = initial_job_seconds
+        # Leave one worker for interactive jobs unless there is only one
+        self.batch_workers = batch_workers or max(workers - 1, 1)
+        self._interactive: Deque[Tuple] = deque()
+        self._batch: Deque[Tuple] = deque()
+        self._batch_waiting: Set[str] = set()
+        self._batch_running = 0
+        # Set when work arrives or a batch slot frees up, and when the batch lane has space
+        self._ready: Optional[asyncio.Event] = None
+        self._batch_space: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._tickets: Dict[str, int] = {}
+        self._next_ticket = 0
+        self._dequeued = 0
+        self._running: Dict[str, float] = {}
+        self._job_tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        self._batch_space = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} clone workers (max queue depth {self.max_depth})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        """Interactive jobs waiting; queued batch jobs are not counted."""
+        return len(self._tickets)
+
+    @property
+    def batch_depth(self) -> int:
+        return len(self._batch_waiting)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    def estimate_wait(self, position: int) -> float:
+        """Seconds until the job at ``position`` (1-based) starts running."""
+        ahead = position - 1 + self.in_flight
+        return math.floor(ahead / self.workers) * self.avg_job_seconds
+
+    def submit(self, job_id: str, *args) -> int:
+        """Enqueue a job and return its queue position, or raise QueueFullError."""
+        if self._ready is None:
+            raise RuntimeError("JobQueue has not been started")
+        position = self.depth + 1
+        wait = self.estimate_wait(position)
+        # Cancelled jobs hold their slot until a worker drops them
+        if len(self._interactive) >= self.max_depth:
+            raise QueueFullError(
+                f"Clone queue is full ({self.max_depth} jobs waiting)",
+                retry_after=max(self.avg_job_seconds / self.workers, 1.0),
+            )
+        if wait > self.slo_seconds:
+            raise QueueFullError(
+                f"Estimated wait of {wait:.0f}s exceeds the {self.slo_seconds:.0f}s SLO",
+                retry_after=max(wait - self.slo_seconds, 1.0),
+            )
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._tickets[job_id] = ticket
+        self._interactive.append((ticket, job_id, args, None))
+        self._ready.set()
+        return position
+
+    async def run(self, job_id: str, *args):
+        """Enqueue a job in the batch lane, waiting for space there, and await its completion.
+
+        Used by bulk submitters that prefer backpressure over 429 rejections. Batch jobs
+        have their own depth limit and run only when no interactive job is waiting.
+        """
+        if self._ready is None:
+            raise RuntimeError("JobQueue has not been started")
+        done = asyncio.get_running_loop().create_future()
+        # Counted as waiting while it waits for space, so cancel() can reach it there too
+        self._batch_waiting.add(job_id)
+        try:
+            while len(self._batch) >= self.max_depth:
+                self._batch_space.clear()
+                await self._batch_space.wait()
+        except asyncio.CancelledError:
+            self._batch_waiting.discard(job_id)
+            raise
+        if job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            self._batch_waiting.discard(job_id)
+            if self.on_skip is not None:
+                self.on_skip(job_id)
+            return
+        self._batch.append((None, job_id, args, done))
+        self._ready.set()
+        await done
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job, or None if it is not waiting."""
+        ticket = self._tickets.get(job_id)
+        if ticket is None:
+            return None
+        return max(ticket - self._dequeued + 1, 1)
+
+    def eta(self, job_id: str) -> Optional[float]:
+        """Estimated seconds until the job completes, or None if it is unknown."""
+        started = self._running.get(job_id)
+        if started is not None:
+            return max(self.avg_job_seconds - (time.monotonic() - started), 0.0)
+        position = self.position(job_id)
+        if position is None:
+            return None
+        return self.estimate_wait(position) + self.avg_job_seconds
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if the queue does not hold it.
+
+        A queued job is skipped when it reaches a worker. A running job's task is
+        cancelled, which interrupts whatever it is awaiting (HTTP fetch, LLM
+        request, retry sleep) at once.
+        """
+        if job_id in self._tickets or job_id in self._batch_waiting:
+            self._tickets.pop(job_id, None)
+            self._batch_waiting.discard(job_id)
+            self._cancelled.add(job_id)
+            return True
+        task = self._job_tasks.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+            return True
+        return False
+
+    def _has_work(self) -> bool:
+        return bool(self._interactive) or (bool(self._batch) and self._batch_running < self.batch_workers)
+
+    async def _next(self) -> Tuple[Tuple, bool]:
+        """Wait for the next job: the oldest interactive one, else a batch job if the batch lane has room."""
+        while not self._has_work():
+            self._ready.clear()
+            await self._ready.wait()
+        if self._interactive:
+            return self._interactive.popleft(), False
+        self._batch_running += 1
+        self._batch_space.set()
+        return self._batch.popleft(), True
+
+    async def _worker(self, index: int):
+        while True:
+            (ticket, job_id, args, done), is_batch = await self._next()
+            try:
+                await self._process(index, ticket, job_id, args, done)
+            finally:
+                if is_batch:
+                    self._batch_running -= 1
+                    self._ready.set()
+
+    async def _process(self, index: int, ticket: Optional[int], job_id: str, args, done):
+        self._tickets.pop(job_id, None)
+        self._batch_waiting.discard(job_id)
+        if ticket is not None:
+            self._dequeued = max(self._dequeued, ticket + 1)
+        if job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            if self.on_skip is not None:
+                self.on_skip(job_id)
+            if done is not None and not done.done():
+                done.set_result(None)
+            return
+
+        started = time.monotonic()
+        self._running[job_id] = started
+        # Run the job as its own task so it can be cancelled without stopping the worker
+        task = asyncio.create_task(self.handler(job_id, *args))
+        self._job_tasks[job_id] = task
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self._job_tasks.pop(job_id, None)
+            self._running.pop(job_id, None)
+            if done is not None and not done.done():
+                done.set_result(None)
+        if task.cancelled():
+            logger.info(f"Job {job_id} cancelled")
+            return
+        if task.exception() is not None:
+            logger.error(f"Worker {index} failed on job {job_id}: {str(task.exception())}")
+        self._record_duration(time.monotonic() - started)
+
+    def _record_duration(self, seconds: float):
+        self.avg_job_seconds += self.smoothing * (seconds - self.avg_job_seconds)
+
+
+def create_job_queue(handler: Callable[..., Awaitable[Any]],
+                     on_skip: Optional[Callable[[str], Any]] = None) -> JobQueue:
+    """Build the job queue configured through environment variables."""
+    return JobQueue(
+        handler,
+        workers=int(os.getenv("CLONE_WORKERS", "4")),
+        max_depth=int(os.getenv("CLONE_QUEUE_MAX_DEPTH", "100")),
+        slo_seconds=float(os.getenv("CLONE_QUEUE_SLO_SECONDS", "600")),
+        initial_job_seconds=float(os.getenv("CLONE_JOB_SECONDS_ESTIMATE", "60")),
+        on_skip=on_skip,
+        batch_workers=int(os.getenv("CLONE_BATCH_WORKERS", "0")) or None,
+    )
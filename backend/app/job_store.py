@@ -0,0 +1,602 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class HtmlSpill:
+    """Writes large generated HTML results to disk instead of keeping them in the store."""
+
+    def __init__(self, spill_dir: str, threshold: int):
+        self.spill_dir = Path(spill_dir)
+        self.threshold = threshold
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def should_spill(self, html: Optional[str]) -> bool:
+        return html is not None and len(html) > self.threshold
+
+    def write(self, job_id: str, html: str) -> str:
+        path = self.spill_dir / f"{job_id}.html"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+        return str(path)
+
+    def read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            logger.warning(f"Spilled HTML missing at {path}")
+            return None
+
+    def iter_chunks(self, path: str, chunk_size: int = 64 * 1024) -> Iterator[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def remove(self, path: Optional[str]):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _record_size(job: Dict[str, Any]) -> int:
+    """Approximate the memory held by a job record (string payloads dominate)."""
+    size = 0
+    for value in job.values():
+        if isinstance(value, str):
+            size += len(value)
+        else:
+            size += 16
+    return size
+
+
+class JobStore:
+    """Base interface for clone job storage.
+
+    Jobs are plain dicts as produced by ``main.py``. Large ``html`` results are
+    spilled to disk and replaced by an ``html_path`` reference; ``get`` loads
+    them back unless ``include_html`` is False.
+    """
+
+    def __init__(self, spill: HtmlSpill, ttl_seconds: Optional[float] = None):
+        self.spill = spill
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str, include_html: bool = True) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, job_id: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def size_bytes(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id, include_html=False) is not None
+
+    def get_html(self, job_id: str) -> Optional[str]:
+        job = self.get(job_id)
+        return job.get("html") if job else None
+
+    def iter_html(self, job_id: str, chunk_size: int = 64 * 1024) -> Optional[Iterator[str]]:
+        """Stream a job's HTML in chunks without loading spilled results into memory."""
+        job = self.get(job_id, include_html=False)
+        if job is None:
+            return None
+        if job.get("html") is None and job.get("html_path"):
+            return self.spill.iter_chunks(job["html_path"], chunk_size)
+        html = job.get("html") or ""
+        return iter([html[i:i + chunk_size] for i in range(0, len(html), chunk_size)])
+
+    def _prepare(self, job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Spill an oversized ``html`` field to disk before storing the record."""
+        html = job.get("html")
+        if self.spill.should_spill(html):
+            job["html_path"] = self.spill.write(job_id, html)
+            job["html"] = None
+        return job
+
+    def _hydrate(self, job: Dict[str, Any], include_html: bool) -> Dict[str, Any]:
+        job = dict(job)
+        if include_html and job.get("html") is None and job.get("html_path"):
+            job["html"] = self.spill.read(job["html_path"])
+        return job
+
+    def _expired(self, job: Dict[str, Any], now: float) -> bool:
+        return bool(self.ttl_seconds) and now - job.get("updated_at", now) > self.ttl_seconds
+
+
+class MemoryJobStore(JobStore):
+    """In-process job store with LRU + TTL eviction and a total byte cap.
+
+    Active jobs are kept in a separate table so they are never evicted while
+    running; once a job reaches a terminal status it moves into the LRU table.
+    A second ordering by ``updated_at`` drives TTL expiry, since a recently
+    read job can be older than the LRU head. All operations are O(1) apart
+    from eviction, which is amortized O(1).
+
+    Oversized HTML is written to disk on a background thread; the record keeps
+    the text until the file is in place. Spilled files live in a directory of
+    this process's own, guarded by a lock file, so on startup the directories
+    of processes that have exited are deleted.
+    """
+
+    def __init__(self, spill: HtmlSpill, max_jobs: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024, ttl_seconds: Optional[float] = 24 * 3600):
+        _sweep_memory_spills(spill.spill_dir)
+        own_dir = spill.spill_dir / f"memory-{uuid.uuid4().hex}"
+        self._owner_lock = _hold_owner_lock(own_dir / ".lock")
+        super().__init__(HtmlSpill(str(own_dir), spill.threshold), ttl_seconds)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-spill")
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._done: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Terminal jobs in order of their last update, oldest first
+        self._by_update: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        job = dict(job)
+        job.setdefault("created_at", now)
+        job["updated_at"] = now
+        with self._lock:
+            self._store(job["id"], self._prepare(job["id"], job))
+            self._evict(now)
+
+    def get(self, job_id: str, include_html: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._active.get(job_id)
+            if job is None:
+                job = self._done.get(job_id)
+                if job is None:
+                    return None
+                if self._expired(job, time.time()):
+                    self._remove(job_id)
+                    return None
+                self._done.move_to_end(job_id)
+        return self._hydrate(job, include_html)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            job = self._active.get(job_id) or self._done.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            job.update(fields)
+            job["updated_at"] = now
+            self._store(job_id, self._prepare(job_id, job))
+            self._evict(now)
+            return dict(job)
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._remove(job_id)
+
+    def __len__(self) -> int:
+        return len(self._active) + len(self._done)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def close(self) -> None:
+        # Results do not outlive the process, so neither do their files
+        self._writer.shutdown(wait=True)
+        self._owner_lock.close()
+        shutil.rmtree(self.spill.spill_dir, ignore_errors=True)
+
+    def _prepare(self, job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        html = job.get("html")
+        if self.spill.should_spill(html):
+            self._writer.submit(self._spill, job_id, html)
+        return job
+
+    def _spill(self, job_id: str, html: str):
+        """Write html to disk, then swap it for the file in the record unless the record moved on."""
+        try:
+            path = self.spill.write(job_id, html)
+        except OSError as e:
+            logger.error(f"Failed to spill HTML of job {job_id}: {str(e)}")
+            return
+        with self._lock:
+            job = self._active.get(job_id) or self._done.get(job_id)
+            current = job is not None and job.get("html") is html
+            if current:
+                # In place, so the record keeps its LRU and TTL positions
+                self._bytes -= self._sizes[job_id]
+                job["html"] = None
+                job["html_path"] = path
+                self._sizes[job_id] = _record_size(job)
+                self._bytes += self._sizes[job_id]
+        if not current:
+            self.spill.remove(path)
+
+    def _store(self, job_id: str, job: Dict[str, Any]):
+        self._bytes -= self._sizes.get(job_id, 0)
+        size = _record_size(job)
+        self._sizes[job_id] = size
+        self._bytes += size
+        if job.get("status") in TERMINAL_STATUSES:
+            self._active.pop(job_id, None)
+            self._done[job_id] = job
+            self._done.move_to_end(job_id)
+            self._by_update[job_id] = job
+            self._by_update.move_to_end(job_id)
+        else:
+            self._done.pop(job_id, None)
+            self._by_update.pop(job_id, None)
+            self._active[job_id] = job
+
+    def _remove(self, job_id: str):
+        job = self._active.pop(job_id, None) or self._done.pop(job_id, None)
+        self._by_update.pop(job_id, None)
+        self._bytes -= self._sizes.pop(job_id, 0)
+        if job:
+            self.spill.remove(job.get("html_path"))
+
+    def _evict(self, now: float):
+        while self._by_update:
+            oldest_id, oldest = next(iter(self._by_update.items()))
+            if not self._expired(oldest, now):
+                break
+            self._remove(oldest_id)
+        while self._done and (len(self) > self.max_jobs or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._done)))
+
+
+class SqliteJobStore(JobStore):
+    """Job store backed by a local SQLite database in WAL mode.
+
+    Lookups go through the primary key index, so they stay fast at hundreds of
+    thousands of rows. Several worker processes can share one database: each
+    job records the process that owns it, and each process holds an exclusive
+    lock file for its lifetime. Jobs survive restarts; on open, a job that was
+    still running is marked failed only if its owner's lock is free, i.e. that
+    process has exited. Row count and total size live in a table kept current
+    by triggers, so every process sees the same totals.
+
+    Nothing on the calling (event loop) thread waits for a write. Creates,
+    updates, deletes, eviction and HTML spills run in order on one writer
+    thread, where waiting for another process's lock is harmless. Until a
+    write lands, this process reads the job from an in-memory overlay, so
+    callers see their own writes at once; other processes see them a moment
+    later. Reads use a separate connection, which in WAL mode never waits for
+    a writer.
+    """
+
+    def __init__(self, path: str, spill: HtmlSpill, max_jobs: int = 500000,
+                 max_bytes: int = 1024 * 1024 * 1024, ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        super().__init__(spill, ttl_seconds)
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._owner_dir = Path(f"{path}.owners")
+        self.owner = uuid.uuid4().hex
+        self._owner_lock = _hold_owner_lock(self._owner_dir / f"{self.owner}.lock")
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    html_path TEXT,
+                    size INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at)")
+            if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'job_totals'").fetchone():
+                self._conn.execute("CREATE TABLE job_totals (count INTEGER NOT NULL, bytes INTEGER NOT NULL)")
+                self._conn.execute("INSERT INTO job_totals SELECT COUNT(*), COALESCE(SUM(size), 0) FROM jobs")
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS jobs_insert AFTER INSERT ON jobs "
+                "BEGIN UPDATE job_totals SET count = count + 1, bytes = bytes + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS jobs_update AFTER UPDATE OF size ON jobs "
+                "BEGIN UPDATE job_totals SET bytes = bytes - OLD.size + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS jobs_delete AFTER DELETE ON jobs "
+                "BEGIN UPDATE job_totals SET count = count - 1, bytes = bytes - OLD.size; END"
+            )
+            self._conn.execute("COMMIT")
+        self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=1)
+        self._read_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        # Latest view of jobs with writes still queued (None once deleted), and how many are queued
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending_writes: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._fail_incomplete()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        job = dict(job)
+        job.setdefault("created_at", now)
+        job["updated_at"] = now
+        self._submit(job["id"], job, self._flush_create, job["id"], dict(job), now)
+
+    def get(self, job_id: str, include_html: bool = True) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            if job_id in self._pending:
+                job = self._pending[job_id]
+                return None if job is None else self._hydrate(job, include_html)
+        job = self._read(job_id)
+        if job is None:
+            return None
+        if job.get("status") in TERMINAL_STATUSES and self._expired(job, time.time()):
+            self.delete(job_id)
+            return None
+        return self._hydrate(job, include_html)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._pending_lock:
+            pending = job_id in self._pending
+            job = self._pending.get(job_id)
+        if not pending:
+            job = self._read(job_id)
+        if job is None:
+            return None
+        job = {**job, **fields, "updated_at": now}
+        # The writer merges fields into the row as it is then, not into this view,
+        # so another process's concurrent update is not overwritten
+        self._submit(job_id, job, self._flush_update, job_id, fields, now)
+        return dict(job)
+
+    def delete(self, job_id: str) -> None:
+        self._submit(job_id, None, self._delete, job_id)
+
+    def __len__(self) -> int:
+        with self._read_lock:
+            return self._totals(self._reader)[0]
+
+    @property
+    def size_bytes(self) -> int:
+        with self._read_lock:
+            return self._totals(self._reader)[1]
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+        with self._read_lock:
+            self._reader.close()
+        self._owner_lock.close()
+        _remove_file(self._owner_lock.name)
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._read_lock:
+            row = self._reader.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _submit(self, job_id: str, view: Optional[Dict[str, Any]], write, *args):
+        """Queue a write for the writer thread; job_id reads as view until it lands."""
+        with self._pending_lock:
+            self._pending[job_id] = view
+            self._pending_writes[job_id] = self._pending_writes.get(job_id, 0) + 1
+        self._writer.submit(self._flush, job_id, write, *args)
+
+    def _flush(self, job_id: str, write, *args):
+        try:
+            with self._lock:
+                write(*args)
+        except Exception as e:
+            logger.error(f"Job store write for {job_id} failed: {str(e)}")
+        finally:
+            with self._pending_lock:
+                self._pending_writes[job_id] -= 1
+                if not self._pending_writes[job_id]:
+                    del self._pending_writes[job_id]
+                    del self._pending[job_id]
+
+    def _flush_create(self, job_id: str, job: Dict[str, Any], now: float):
+        self._write(job_id, self._prepare(job_id, job))
+        self._evict(now)
+
+    def _flush_update(self, job_id: str, fields: Dict[str, Any], now: float):
+        # Read-modify-write in one transaction so another process cannot interleave
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return
+            job = json.loads(row[0])
+            job.update(fields)
+            job["updated_at"] = now
+            self._write(job_id, self._prepare(job_id, job))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._evict(now)
+
+    def _totals(self, conn: Optional[sqlite3.Connection] = None):
+        return (conn or self._conn).execute("SELECT count, bytes FROM job_totals").fetchone()
+
+    def _write(self, job_id: str, job: Dict[str, Any]):
+        # An upsert (not INSERT OR REPLACE) so the update trigger sees the old size
+        self._conn.execute(
+            """
+            INSERT INTO jobs (id, status, data, html_path, size, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET status = excluded.status, data = excluded.data,
+                html_path = excluded.html_path, size = excluded.size, updated_at = excluded.updated_at,
+                owner = excluded.owner
+            """,
+            (job_id, job.get("status", ""), json.dumps(job), job.get("html_path"), _record_size(job),
+             job["updated_at"], self.owner),
+        )
+
+    def _delete(self, job_id: str):
+        row = self._conn.execute("SELECT html_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self.spill.remove(row[0])
+
+    def _evict(self, now: float):
+        """Drop expired terminal jobs, then the least recently updated ones while over capacity."""
+        if self.ttl_seconds:
+            self._delete_where("updated_at < ?", (now - self.ttl_seconds,))
+        while True:
+            count, total = self._totals()
+            if count <= self.max_jobs and total <= self.max_bytes:
+                break
+            # Only as many rows as are over the count cap; small batches while over the byte cap
+            excess = count - self.max_jobs
+            if not self._delete_where("1 = 1", (), limit=excess if excess > 0 else 10):
+                break
+
+    def _delete_where(self, condition: str, params: tuple, limit: int = 1000) -> int:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        rows = self._conn.execute(
+            f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND {condition} ORDER BY updated_at LIMIT ?",
+            (*TERMINAL_STATUSES, *params, limit),
+        ).fetchall()
+        for (job_id,) in rows:
+            self._delete(job_id)
+        return len(rows)
+
+    def _fail_incomplete(self):
+        """Fail unfinished jobs whose owning process has exited; other workers' jobs are left alone."""
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT id, owner FROM jobs WHERE status NOT IN ({placeholders}) AND owner IS NOT ?",
+                (*TERMINAL_STATUSES, self.owner)
+            ).fetchall()
+        alive: Dict[Optional[str], bool] = {}
+        for job_id, owner in rows:
+            if owner not in alive:
+                alive[owner] = owner is not None and _owner_alive(self._owner_dir / f"{owner}.lock")
+            if alive[owner]:
+                continue
+            logger.info(f"Marking interrupted job {job_id} as failed")
+            self.update(
+                job_id,
+                status="failed",
+                progress=100,
+                message="Error: job interrupted by server restart",
+                error="job interrupted by server restart",
+            )
+
+
+def _hold_owner_lock(path: Path):
+    """Create and exclusively lock a file for this process's lifetime; the OS drops the lock when it exits."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(path, "a+")
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return handle
+
+
+def _owner_alive(path: Path) -> bool:
+    """Whether the process that created the lock file still holds it."""
+    if fcntl is None:
+        # Without flock there is no liveness check; only a single worker is supported
+        return False
+    try:
+        with open(path, "a+") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(handle, fcntl.LOCK_UN)
+    except OSError:
+        return False
+    _remove_file(path)
+    return False
+
+
+def _sweep_memory_spills(spill_dir: Path):
+    """Delete the spill directories of memory stores whose process has exited."""
+    if not spill_dir.is_dir():
+        return
+    for path in spill_dir.glob("memory-*"):
+        if path.is_dir() and not _owner_alive(path / ".lock"):
+            logger.info(f"Removing orphaned spilled results in {path}")
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_job_store() -> JobStore:
+    """Build the job store configured through environment variables."""
+    backend = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+    spill = HtmlSpill(
+        spill_dir=os.getenv("JOB_STORE_SPILL_DIR", "data/results"),
+        threshold=int(os.getenv("JOB_STORE_SPILL_THRESHOLD", str(64 * 1024))),
+    )
+    ttl = float(os.getenv("JOB_STORE_TTL_SECONDS", str(24 * 3600))) or None
+    max_jobs = int(os.getenv("JOB_STORE_MAX_JOBS", "10000"))
+    max_bytes = int(os.getenv("JOB_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    if backend == "sqlite":
+        path = os.getenv("JOB_STORE_PATH", "data/jobs.db")
+        logger.info(f"Using SQLite job store at {path}")
+        return SqliteJobStore(path, spill, max_jobs=max_jobs, max_bytes=max_bytes, ttl_seconds=ttl)
+    if backend != "memory":
+        raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend}")
+    return MemoryJobStore(spill, max_jobs=max_jobs, max_bytes=max_bytes, ttl_seconds=ttl)
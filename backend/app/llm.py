@@ -1,13 +1,19 @@
 import openai
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 import json
 from pathlib import Path
 import os
+import re
+import asyncio
 from dotenv import load_dotenv
 import httpx
-import time
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt, stop_any, wait_exponential
+from .instrumentation import stage, record, record_retry
+from .rate_limit import estimate_tokens, get_rate_limiter
+from .completion_cache import completion_key, get_completion_cache
+from .prompt_budget import MAX_CHARS_PER_TOKEN, PromptBuilder
+from .providers import create_provider_router, template_artifact
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -16,6 +22,121 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+GENERATION_MODES = ('sequential', 'concurrent', 'single')
+ARTIFACTS = ('html', 'css', 'javascript')
+
+# Section markers of the single-call response, e.g. "===HTML==="
+_SECTION_MARKER = re.compile(r'^[ \t]*={3,}[ \t]*(HTML|CSS|JS|JAVASCRIPT|END)[ \t]*={3,}[ \t]*$', re.IGNORECASE | re.MULTILINE)
+_MARKER_ARTIFACTS = {'HTML': 'html', 'CSS': 'css', 'JS': 'javascript', 'JAVASCRIPT': 'javascript'}
+_FENCED_BLOCK = re.compile(r'```(html|css|javascript|js)[ \t]*\n(.*?)```', re.IGNORECASE | re.DOTALL)
+_FENCE = re.compile(r'^```[\w-]*[ \t]*\n(.*?)\n?```$', re.DOTALL)
+
+_backoff = wait_exponential(multiplier=1, min=1, max=30)
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "60"))
+    )
+
+
+def _http_timeout(total: Optional[float] = None) -> httpx.Timeout:
+    """Connect/read timeouts for one request, none of them longer than total seconds."""
+    connect = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+    read = float(os.getenv("OPENAI_READ_TIMEOUT_SECONDS", "120"))
+    if total is not None:
+        connect, read = min(connect, total), min(read, total)
+    return httpx.Timeout(read, connect=connect, pool=connect)
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """Shared connection pool for the async OpenAI client: bounded, kept alive, HTTP/2 when h2 is installed."""
+    return httpx.AsyncClient(http2=HTTP2 and os.getenv("OPENAI_HTTP2", "true").lower() == "true",
+                             limits=_http_limits(), timeout=_http_timeout())
+
+
+def split_artifacts(text: str) -> Dict[str, str]:
+    """
+    Split a single-call completion into html/css/javascript.
+    Sections missing, empty or implausible are left out so the caller can request them
+    separately. Without an END marker the last section may have been cut off by
+    max_tokens, so it is dropped too; anything after END is ignored. Responses without
+    markers fall back to fenced code blocks.
+    """
+    artifacts: Dict[str, str] = {}
+    markers = list(_SECTION_MARKER.finditer(text))
+    end_index = next((index for index, m in enumerate(markers) if m.group(1).upper() == 'END'), None)
+    complete = end_index is not None
+    if complete:
+        markers = markers[:end_index + 1]
+    if markers:
+        for index, marker in enumerate(markers):
+            name = _MARKER_ARTIFACTS.get(marker.group(1).upper())
+            if name is None or name in artifacts:
+                continue
+            is_last = index + 1 == len(markers)
+            if is_last and not complete:
+                continue
+            end = len(text) if is_last else markers[index + 1].start()
+            body = text[marker.end():end].strip()
+            fence = _FENCE.match(body)
+            artifacts[name] = fence.group(1).strip() if fence else body
+    else:
+        for match in _FENCED_BLOCK.finditer(text):
+            artifacts.setdefault(_MARKER_ARTIFACTS[match.group(1).upper()], match.group(2).strip())
+    return {name: code for name, code in artifacts.items() if _plausible(name, code)}
+
+
+def combined_template(scraped_data: Dict) -> str:
+    """Template fallback for all three artifacts in the single-call section format."""
+    sections = [f"==={marker}===\n{template_artifact(name, scraped_data)}"
+                for marker, name in (('HTML', 'html'), ('CSS', 'css'), ('JS', 'javascript'))]
+    return "\n".join(sections) + "\n===END===\n"
+
+
+def _plausible(name: str, code: str) -> bool:
+    if not code:
+        return False
+    if name == 'html':
+        return '<' in code
+    if name == 'css':
+        return '{' in code
+    return True
+
+
+def _usage_field(usage, name: str, default=0):
+    # The pinned SDK's chunk model has no usage field, so streamed usage may arrive as a plain dict
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return default if value is None else value
+
+
+def _deadline_passed(retry_state) -> bool:
+    """Stop retrying once the caller's deadline (event-loop time, passed as deadline=) is over."""
+    deadline = retry_state.kwargs.get('deadline')
+    return deadline is not None and asyncio.get_running_loop().time() >= deadline
+
+
+def _retry_wait(retry_state) -> float:
+    """Back off on transient errors; 429s are paced by the rate limiter's Retry-After pause instead."""
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(error, openai.RateLimitError):
+        return 0
+    wait = _backoff(retry_state)
+    deadline = retry_state.kwargs.get('deadline')
+    if deadline is not None:
+        # No point sleeping past the deadline; the next attempt then fails fast and stops the retries
+        wait = min(wait, max(deadline - asyncio.get_running_loop().time(), 0))
+    return wait
+
+
 class LLMGenerator:
     def __init__(self, api_key: Optional[str] = None):
         # Get API key from environment variable
@@ -27,85 +148,261 @@ class LLMGenerator:
         
         try:
             # Initialize OpenAI client with minimal configuration
+            # Retries are owned by tenacity + the shared rate limiter, not the SDK
             self.client = openai.OpenAI(
                 api_key=self.api_key,
-                http_client=httpx.Client()
+                http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+                max_retries=0
+            )
+            # Async client used by the event-loop pipeline; all jobs multiplex over its few warm connections
+            self._async_http_client = create_async_http_client()
+            self.async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=self._async_http_client,
+                max_retries=0
             )
+            self.rate_limiter = get_rate_limiter()
+            self.completion_cache = get_completion_cache()
+            self.model = "gpt-4"
+            self.temperature = 0.7
+            # Token budget for the design data packed into each prompt
+            self.prompt_budgets = {
+                # Defaults are close to what the former fixed character cuts sent
+                'html': int(os.getenv("LLM_HTML_PROMPT_TOKENS", "400")),
+                'css': int(os.getenv("LLM_CSS_PROMPT_TOKENS", "400")),
+                'javascript': int(os.getenv("LLM_JS_PROMPT_TOKENS", "250")),
+                'combined': int(os.getenv("LLM_COMBINED_PROMPT_TOKENS", "800"))
+            }
+            self.generation_mode = os.getenv("LLM_GENERATION_MODE", "concurrent")
+            if self.generation_mode not in GENERATION_MODES:
+                raise ValueError(f"LLM_GENERATION_MODE must be one of {GENERATION_MODES}")
+            self.streaming = os.getenv("LLM_STREAMING", "true").lower() == "true"
+            self.combined_max_tokens = int(os.getenv("LLM_COMBINED_MAX_TOKENS", "3000"))
+            # Async completions go through the router (OpenAI plus any configured fallback providers)
+            self.router = create_provider_router(self)
+            self._artifact_calls = {
+                'html': ('llm_html', self._html_messages),
+                'css': ('llm_css', self._css_messages),
+                'javascript': ('llm_js', self._js_messages)
+            }
             logger.info("OpenAI client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {str(e)}")
             raise
 
-    @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=5, min=10, max=120))
-    def _call_openai(self, messages: List[Dict], max_tokens: int = 1000) -> str:
-        """Make an API call to OpenAI with retries and longer delays."""
+    def _call_openai(self, messages: List[Dict], max_tokens: int = 1000, use_cache: bool = True) -> str:
+        """Complete through the shared completion cache; use_cache=False forces a fresh call (still stored)."""
+        key = self._completion_key('openai', self.model, messages, max_tokens)
+        if use_cache:
+            cached = self.completion_cache.get(key)
+            if cached is not None:
+                record(llm_cache_hits=1)
+                return cached
+        content = self._request_openai(messages, max_tokens)
+        self.completion_cache.put(key, content)
+        return content
+
+    def _completion_key(self, provider: str, model: str, messages: List[Dict], max_tokens: int) -> str:
+        # Completions are keyed by the provider and model that produced them
+        return completion_key(f"{provider}/{model}", messages, self.temperature, max_tokens)
+
+    async def _complete_async(self, messages: List[Dict], max_tokens: int = 1000,
+                              on_delta: Optional[Callable[[int, str], None]] = None,
+                              use_cache: bool = True,
+                              fallback: Optional[Callable[[], str]] = None) -> Tuple[str, str]:
+        """
+        Async completion through the completion cache and the provider router, returned with
+        its source: the provider name, 'cache' or 'template'. A cache hit is delivered to
+        on_delta as a single delta. When no provider answers before the router deadline,
+        fallback() supplies the result, which is never cached.
+        """
+        if use_cache:
+            for provider in self.router.providers:
+                cached = self.completion_cache.get(
+                    self._completion_key(provider.name, provider.model, messages, max_tokens))
+                if cached is not None:
+                    record(llm_cache_hits=1)
+                    if on_delta is not None:
+                        on_delta(0, cached)
+                    return cached, 'cache'
+        content, source = await self.router.complete(messages, max_tokens, on_delta=on_delta, fallback=fallback)
+        if source == 'template':
+            if on_delta is not None:
+                on_delta(0, content)
+        else:
+            producer = next(p for p in self.router.providers if p.name == source)
+            self.completion_cache.put(self._completion_key(source, producer.model, messages, max_tokens), content)
+        return content, source
+
+    @retry(stop=stop_after_attempt(5), wait=_retry_wait, before_sleep=record_retry)
+    def _request_openai(self, messages: List[Dict], max_tokens: int = 1000) -> str:
+        """Make an API call to OpenAI, paced by the shared rate limiter."""
+        estimated = estimate_tokens(messages, max_tokens)
         try:
-            # Add a delay before each attempt to avoid rate limits
-            time.sleep(5)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=max_tokens
-            )
+            with self.rate_limiter.acquire_sync(estimated):
+                raw = self.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens
+                )
+            response = self._handle_response(raw, estimated)
+            return response.choices[0].message.content
+        except Exception as e:
+            self._handle_error(e)
+            raise
+
+    @retry(stop=stop_any(stop_after_attempt(5), _deadline_passed), wait=_retry_wait, before_sleep=record_retry)
+    async def _request_openai_async(self, messages: List[Dict], max_tokens: int = 1000,
+                                    on_delta: Optional[Callable[[int, str], None]] = None,
+                                    deadline: Optional[float] = None) -> str:
+        """
+        Async variant of _request_openai; waits yield to the event loop instead of blocking a thread.
+        With on_delta the completion is streamed and on_delta(offset, text) is called per token
+        delta; offset restarts at 0 when a retry begins. deadline (event-loop time) caps the
+        HTTP timeouts of every attempt, so no request outlives its caller.
+        """
+        estimated = estimate_tokens(messages, max_tokens)
+        try:
+            async with self.rate_limiter.acquire(estimated):
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("LLM deadline passed before the request was sent")
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens,
+                    stream=on_delta is not None,
+                    timeout=_http_timeout(remaining),
+                    # Ask for a final usage chunk; passed as extra_body because the pinned
+                    # SDK predates the stream_options parameter
+                    extra_body={"stream_options": {"include_usage": True}} if on_delta is not None else None
+                )
+                if on_delta is not None:
+                    return await self._consume_stream(raw, messages, estimated, on_delta)
+            response = self._handle_response(raw, estimated)
             return response.choices[0].message.content
         except Exception as e:
-            logger.error(f"OpenAI API call failed: {str(e)}")
-            # Add extra delay on error
-            time.sleep(10)
+            self._handle_error(e)
             raise
 
+    async def _consume_stream(self, raw, messages: List[Dict], estimated_tokens: int,
+                              on_delta: Callable[[int, str], None]) -> str:
+        """Forward streamed deltas as they arrive and assemble the completion once at the end."""
+        self.rate_limiter.update_from_headers(raw.headers)
+        pieces = []
+        offset = 0
+        usage = None
+        async for chunk in raw.parse():
+            # With include_usage the last chunk has no choices and carries the usage of the whole call
+            usage = getattr(chunk, 'usage', None) or usage
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                on_delta(offset, text)
+                pieces.append(text)
+                offset += len(text)
+        content = "".join(pieces)
+        if usage is None:
+            # Endpoints that ignore stream_options send no usage, so estimate it from the text
+            self.rate_limiter.record_usage(estimated_tokens, estimate_tokens(messages, 0) + len(content) // 4)
+            record(llm_calls=1, prompt_tokens=estimate_tokens(messages, 0), completion_tokens=len(content) // 4)
+        else:
+            self.rate_limiter.record_usage(estimated_tokens, _usage_field(usage, 'total_tokens'))
+            self._record_usage(usage)
+        self.rate_limiter.on_success()
+        return content
+
+    def _handle_response(self, raw, estimated_tokens: int):
+        """Feed rate-limit headers and actual usage back to the limiter and parse the completion."""
+        self.rate_limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        usage = getattr(response, 'usage', None)
+        if usage is not None and usage.total_tokens:
+            self.rate_limiter.record_usage(estimated_tokens, usage.total_tokens)
+        self.rate_limiter.on_success()
+        self._record_usage(getattr(response, 'usage', None))
+        return response
+
+    def _handle_error(self, error: Exception):
+        logger.error(f"OpenAI API call failed: {str(error)}")
+        if isinstance(error, openai.RateLimitError):
+            self.rate_limiter.on_rate_limited(error.response.headers)
+
+    def _record_usage(self, usage):
+        """Add a completion's token usage to the current job's metrics."""
+        record(llm_calls=1)
+        if usage is not None:
+            record(prompt_tokens=_usage_field(usage, 'prompt_tokens'),
+                   completion_tokens=_usage_field(usage, 'completion_tokens'))
+            # OpenAI caches long prompt prefixes automatically and reports the reused part here
+            details = _usage_field(usage, 'prompt_tokens_details', None)
+            record(prompt_cache_read_tokens=_usage_field(details, 'cached_tokens') if details else 0)
+
     def _truncate_text(self, text: str, max_chars: int = 500) -> str:
         """Truncate text to a maximum number of characters, adding ellipsis if needed."""
         if len(text) > max_chars:
             return text[:max_chars] + "... [truncated]"
         return text
 
-    def _truncate_json(self, data, max_chars: int = 500) -> str:
-        """Truncate a JSON-serializable object to a string of max_chars."""
-        s = json.dumps(data, indent=2)
-        return self._truncate_text(s, max_chars)
+    def _prepare_scraped_data(self, scraped_data: Dict) -> Dict:
+        """Truncate raw_html, which no prompt uses; prompt fields are sized by PromptBuilder."""
+        if 'raw_html' in scraped_data:
+            scraped_data['raw_html'] = self._truncate_text(scraped_data['raw_html'], 500)
+        return scraped_data
+
+    def _combined_messages(self, scraped_data: Dict) -> List[Dict]:
+        return [
+            {"role": "system", "content": (
+                "You are a web development expert. Generate the HTML structure, CSS styles and JavaScript for a "
+                "website based on the provided design data. Reply with exactly three sections, each introduced by a "
+                "marker on its own line: ===HTML===, ===CSS===, ===JS===. Finish with ===END=== on its own line. "
+                "Put only code in each section."
+            )},
+            {"role": "user", "content": self._create_combined_prompt(scraped_data)}
+        ]
+
+    def _html_messages(self, scraped_data: Dict) -> List[Dict]:
+        return [
+            {"role": "system", "content": "You are a web development expert. Generate clean, semantic HTML structure based on the provided design data."},
+            {"role": "user", "content": self._create_html_prompt(scraped_data)}
+        ]
+
+    def _css_messages(self, scraped_data: Dict) -> List[Dict]:
+        return [
+            {"role": "system", "content": "You are a CSS expert. Generate modern, responsive CSS styles based on the provided design data."},
+            {"role": "user", "content": self._create_css_prompt(scraped_data)}
+        ]
+
+    def _js_messages(self, scraped_data: Dict) -> List[Dict]:
+        return [
+            {"role": "system", "content": "You are a JavaScript expert. Generate clean, modern JavaScript code for interactivity based on the provided design data."},
+            {"role": "user", "content": self._create_js_prompt(scraped_data)}
+        ]
 
-    def generate_website_code(self, scraped_data: Dict) -> Dict:
+    def generate_website_code(self, scraped_data: Dict, use_cache: bool = True) -> Dict:
         """
         Generate website code based on scraped data using LLM.
         Truncate or chunk data to avoid exceeding context length.
         """
         try:
-            # Truncate raw_html and styles if present
-            if 'raw_html' in scraped_data:
-                scraped_data['raw_html'] = self._truncate_text(scraped_data['raw_html'], 500)
-            if 'styles' in scraped_data and 'inline_styles' in scraped_data['styles']:
-                scraped_data['styles']['inline_styles'] = [self._truncate_text(s, 250) for s in scraped_data['styles']['inline_styles']]
+            scraped_data = self._prepare_scraped_data(scraped_data)
 
             # Generate HTML first
-            html_prompt = self._create_html_prompt(scraped_data)
             logger.info("Generating HTML structure...")
-            html_code = self._call_openai([
-                {"role": "system", "content": "You are a web development expert. Generate clean, semantic HTML structure based on the provided design data."},
-                {"role": "user", "content": html_prompt}
-            ])
-
-            time.sleep(5)  # Increased delay between calls
+            html_code = self._call_openai(self._html_messages(scraped_data), use_cache=use_cache)
 
             # Generate CSS
-            css_prompt = self._create_css_prompt(scraped_data)
             logger.info("Generating CSS styles...")
-            css_code = self._call_openai([
-                {"role": "system", "content": "You are a CSS expert. Generate modern, responsive CSS styles based on the provided design data."},
-                {"role": "user", "content": css_prompt}
-            ])
-
-            time.sleep(5)  # Increased delay between calls
+            css_code = self._call_openai(self._css_messages(scraped_data), use_cache=use_cache)
 
             # Generate JavaScript
-            js_prompt = self._create_js_prompt(scraped_data)
             logger.info("Generating JavaScript...")
-            js_code = self._call_openai([
-                {"role": "system", "content": "You are a JavaScript expert. Generate clean, modern JavaScript code for interactivity based on the provided design data."},
-                {"role": "user", "content": js_prompt}
-            ])
+            js_code = self._call_openai(self._js_messages(scraped_data), use_cache=use_cache)
 
             return {
                 'html': html_code,
@@ -116,30 +413,178 @@ class LLMGenerator:
             logger.error(f"Error generating website code: {str(e)}")
             raise
 
+    async def generate_website_code_async(self, scraped_data: Dict,
+                                          on_artifact: Optional[Callable[[str, str], None]] = None,
+                                          on_delta: Optional[Callable[[str, int, str], None]] = None,
+                                          use_cache: bool = True) -> Dict:
+        """
+        Async variant of generate_website_code for the event-loop pipeline.
+        on_artifact(name, code) is called as soon as each artifact is generated.
+        When streaming is enabled, on_delta(name, offset, text) receives tokens as they arrive.
+        use_cache=False bypasses the completion cache for this request.
+
+        In concurrent mode the three calls run in parallel under the shared rate
+        limiter. A failed CSS or JS call leaves that artifact empty and is listed
+        under 'failed'; a failed HTML call fails the whole generation. Single mode
+        asks for all three in one call and requests only missing or malformed
+        sections separately.
+
+        Artifacts built from the template fallback because no provider answered are
+        listed under 'fallback'.
+        """
+        fallback: List[str] = []
+
+        async def generate(name: str) -> str:
+            stage_name, build_messages = self._artifact_calls[name]
+            logger.info(f"Generating {name}...")
+            sink = None
+            if on_delta is not None and self.streaming:
+                sink = lambda offset, text: on_delta(name, offset, text)
+            with stage(stage_name):
+                code, source = await self._complete_async(build_messages(scraped_data), on_delta=sink,
+                                                          use_cache=use_cache,
+                                                          fallback=lambda: template_artifact(name, scraped_data))
+            if source == 'template':
+                fallback.append(name)
+            if on_artifact is not None:
+                on_artifact(name, code)
+            return code
+
+        try:
+            scraped_data = self._prepare_scraped_data(scraped_data)
+
+            if self.generation_mode == 'sequential':
+                code = {name: await generate(name) for name in ARTIFACTS}
+            elif self.generation_mode == 'single':
+                combined = await self._generate_combined(scraped_data, on_artifact, on_delta, use_cache, fallback)
+                missing = [name for name in ARTIFACTS if name not in combined]
+                if missing:
+                    logger.warning(f"Combined response lacked {', '.join(missing)}; requesting separately")
+                    results = await asyncio.gather(*(generate(name) for name in missing), return_exceptions=True)
+                    combined.update(zip(missing, results))
+                code = self._collect_artifacts({name: combined[name] for name in ARTIFACTS})
+            else:
+                results = await asyncio.gather(*(generate(name) for name in ARTIFACTS), return_exceptions=True)
+                code = self._collect_artifacts(dict(zip(ARTIFACTS, results)))
+            if fallback:
+                code['fallback'] = [name for name in ARTIFACTS if name in fallback]
+            return code
+        except Exception as e:
+            logger.error(f"Error generating website code: {str(e)}")
+            raise
+
+    async def _generate_combined(self, scraped_data: Dict, on_artifact, on_delta, use_cache: bool,
+                                 fallback: List[str]) -> Dict[str, str]:
+        """One call for all three artifacts; returns only the sections that parsed cleanly.
+
+        Sections that came from the template fallback are appended to fallback.
+        """
+        logger.info("Generating HTML, CSS and JavaScript in one call...")
+        sink = None
+        if on_delta is not None and self.streaming:
+            sink = lambda offset, text: on_delta('combined', offset, text)
+        try:
+            with stage('llm_combined'):
+                text, source = await self._complete_async(self._combined_messages(scraped_data),
+                                                          max_tokens=self.combined_max_tokens,
+                                                          on_delta=sink, use_cache=use_cache,
+                                                          fallback=lambda: combined_template(scraped_data))
+        except Exception as e:
+            logger.error(f"Combined generation failed, falling back to separate calls: {str(e)}")
+            return {}
+        code = split_artifacts(text)
+        if source == 'template':
+            fallback.extend(code)
+        if on_artifact is not None:
+            for name in ARTIFACTS:
+                if name in code:
+                    on_artifact(name, code[name])
+        return code
+
+    def _collect_artifacts(self, results: Dict) -> Dict:
+        """Merge concurrently generated artifacts, tolerating CSS/JS failures."""
+        code = {}
+        failed = []
+        for name, result in results.items():
+            if isinstance(result, BaseException):
+                if name == 'html' or not isinstance(result, Exception):
+                    raise result
+                logger.warning(f"{name} generation failed, continuing without it: {str(result)}")
+                code[name] = ''
+                failed.append(name)
+            else:
+                code[name] = result
+        if failed:
+            code['failed'] = failed
+        return code
+
+    def _salient_section(self, section: Dict, max_chars: int) -> List[str]:
+        """Prompt items of a layout section, most salient first: headings, identity, links, text, markup."""
+        items = [f"heading: {heading}" for heading in section.get('headings', []) if heading]
+        identity = ' '.join(filter(None, [f"#{section['id']}" if section.get('id') else '',
+                                          ''.join(f".{c}" for c in section.get('classes', []))]))
+        if identity:
+            items.append(identity)
+        items.extend(f"link: {link.get('text', '')} -> {link.get('href', '')}" for link in section.get('links', []))
+        # The builder cuts an item that only partly fits, so long text keeps its beginning
+        if section.get('content'):
+            items.append(section['content'][:max_chars])
+        if section.get('html'):
+            items.append(f"markup: {self._truncate_text(section['html'], max_chars)}")
+        return items
+
+    def _layout_items(self, section: Dict, budget_tokens: int) -> List[str]:
+        # Nothing longer than the most the prompt budget could ever keep is copied
+        if not section:
+            return []
+        return self._salient_section(section, budget_tokens * MAX_CHARS_PER_TOKEN)
+
+    def _navigation_items(self, navigation: List[Dict]) -> List[str]:
+        return [f"{item.get('text', '')} -> {item.get('href', '')}" for item in navigation or []]
+
     def _create_html_prompt(self, scraped_data: Dict) -> str:
-        """Create a prompt for HTML generation, truncating large fields."""
+        """Create a prompt for HTML generation, packing fields into the HTML token budget."""
+        metadata = scraped_data['metadata']
+        layout = scraped_data['layout']
+        budget = self.prompt_budgets['html']
+        fields = (PromptBuilder(budget, model=self.model)
+                  .add('title', metadata.get('title', ''), weight=1)
+                  .add('description', metadata.get('description', ''), weight=1)
+                  .add('navigation', self._navigation_items(layout.get('navigation')), weight=2, separator='; ')
+                  .add('header', self._layout_items(layout.get('header'), budget), weight=2, separator='; ')
+                  .add('main', self._layout_items(layout.get('main'), budget), weight=4, separator='; ')
+                  .add('footer', self._layout_items(layout.get('footer'), budget), weight=1, separator='; ')
+                  .build())
         return f"""
         Generate a clean, semantic HTML structure for a website based on:
         
-        Title: {self._truncate_text(scraped_data['metadata'].get('title', ''), 50)}
-        Description: {self._truncate_text(scraped_data['metadata'].get('description', ''), 100)}
+        Title: {fields['title']}
+        Description: {fields['description']}
         
         Layout Structure:
-        - Header: {self._truncate_json(scraped_data['layout'].get('header', {}), 150)}
-        - Navigation: {self._truncate_json(scraped_data['layout'].get('navigation', {}), 150)}
-        - Main Content: {self._truncate_json(scraped_data['layout'].get('main', {}), 250)}
-        - Footer: {self._truncate_json(scraped_data['layout'].get('footer', {}), 150)}
+        - Header: {fields['header']}
+        - Navigation: {fields['navigation']}
+        - Main Content: {fields['main']}
+        - Footer: {fields['footer']}
         
         Focus on semantic HTML5 elements and accessibility.
         """
 
     def _create_css_prompt(self, scraped_data: Dict) -> str:
-        """Create a prompt for CSS generation, truncating large fields."""
+        """Create a prompt for CSS generation, packing fields into the CSS token budget."""
+        metadata = scraped_data['metadata']
+        fields = (PromptBuilder(self.prompt_budgets['css'], model=self.model)
+                  .add('colors', metadata.get('color_scheme', []), weight=2)
+                  .add('fonts', metadata.get('fonts', []), weight=1)
+                  .add('styles', scraped_data.get('styles', {}).get('inline_styles', []), weight=3, separator='\n')
+                  .build())
         return f"""
         Generate modern, responsive CSS styles for a website based on:
         
-        Color Scheme: {', '.join(scraped_data['metadata'].get('color_scheme', [])[:3])}
-        Fonts: {', '.join(scraped_data['metadata'].get('fonts', [])[:2])}
+        Color Scheme: {fields['colors']}
+        Fonts: {fields['fonts']}
+        Existing Styles:
+        {fields['styles']}
         
         Include:
         1. Reset/normalize styles
@@ -150,12 +595,23 @@ class LLMGenerator:
         """
 
     def _create_js_prompt(self, scraped_data: Dict) -> str:
-        """Create a prompt for JavaScript generation, truncating large fields."""
+        """Create a prompt for JavaScript generation, packing fields into the JS token budget."""
+        layout = scraped_data['layout']
+        budget = self.prompt_budgets['javascript']
+        fields = (PromptBuilder(budget, model=self.model)
+                  .add('navigation', self._navigation_items(layout.get('navigation')), weight=3, separator='; ')
+                  .add('header', self._layout_items(layout.get('header'), budget), weight=2, separator='; ')
+                  .add('main', self._layout_items(layout.get('main'), budget), weight=2, separator='; ')
+                  .add('footer', self._layout_items(layout.get('footer'), budget), weight=1, separator='; ')
+                  .build())
         return f"""
         Generate modern JavaScript code for a website based on:
         
         Layout Structure:
-        {self._truncate_json(scraped_data['layout'], 300)}
+        - Header: {fields['header']}
+        - Navigation: {fields['navigation']}
+        - Main Content: {fields['main']}
+        - Footer: {fields['footer']}
         
         Include:
         1. Navigation functionality
@@ -164,6 +620,44 @@ class LLMGenerator:
         4. Any interactive elements
         """
 
+    def _create_combined_prompt(self, scraped_data: Dict) -> str:
+        """Create one prompt carrying the design data for all three artifacts."""
+        metadata = scraped_data['metadata']
+        layout = scraped_data['layout']
+        budget = self.prompt_budgets['combined']
+        fields = (PromptBuilder(budget, model=self.model)
+                  .add('title', metadata.get('title', ''), weight=1)
+                  .add('description', metadata.get('description', ''), weight=1)
+                  .add('navigation', self._navigation_items(layout.get('navigation')), weight=2, separator='; ')
+                  .add('header', self._layout_items(layout.get('header'), budget), weight=2, separator='; ')
+                  .add('main', self._layout_items(layout.get('main'), budget), weight=4, separator='; ')
+                  .add('footer', self._layout_items(layout.get('footer'), budget), weight=1, separator='; ')
+                  .add('colors', metadata.get('color_scheme', []), weight=2)
+                  .add('fonts', metadata.get('fonts', []), weight=1)
+                  .add('styles', scraped_data.get('styles', {}).get('inline_styles', []), weight=2, separator='\n')
+                  .build())
+        return f"""
+        Generate a website based on:
+        
+        Title: {fields['title']}
+        Description: {fields['description']}
+        
+        Layout Structure:
+        - Header: {fields['header']}
+        - Navigation: {fields['navigation']}
+        - Main Content: {fields['main']}
+        - Footer: {fields['footer']}
+        
+        Color Scheme: {fields['colors']}
+        Fonts: {fields['fonts']}
+        Existing Styles:
+        {fields['styles']}
+        
+        HTML: semantic HTML5 elements and accessibility.
+        CSS: reset/normalize, responsive grid, typography, component styles, media queries.
+        JS: navigation, smooth scrolling, responsive menu, any interactive elements.
+        """
+
     def save_generated_code(self, code: Dict, output_dir: str):
         """Save the generated code to files."""
         output_path = Path(output_dir)
@@ -179,4 +673,26 @@ class LLMGenerator:
         
         # Save JavaScript
         with open(output_path / 'script.js', 'w') as f:
-            f.write(code['javascript']) 
\ No newline at end of file
+            f.write(code['javascript']) 
+
+    async def save_generated_code_async(self, code: Dict, output_dir: str):
+        """Save the generated code without blocking the event loop."""
+        with stage('save'):
+            await asyncio.to_thread(self.save_generated_code, code, output_dir)
+
+    def pool_stats(self) -> Dict[str, Optional[int]]:
+        """Connections held by the async client's pool, active (in a request) and total.
+
+        httpx does not expose its pool, so both are read from private attributes and are
+        None when those are unavailable.
+        """
+        try:
+            connections = list(self._async_http_client._transport._pool.connections)
+            in_use = sum(1 for c in connections if not c.is_idle())
+        except (AttributeError, TypeError):
+            return {'in_use': None, 'open': None}
+        return {'in_use': in_use, 'open': len(connections)}
+
+    async def close(self):
+        """Release the async HTTP client."""
+        await self.async_client.close()
\ No newline at end of file
@@ -1,32 +1,96 @@
 import json
-from typing import Dict, Any
+import logging
+from typing import Callable, Dict, Any, List, Optional
 import aiohttp
 import os
 from dotenv import load_dotenv
+from .completion_cache import completion_key, get_completion_cache
+from .instrumentation import record
+from .prompt_budget import count_tokens
+from .prompt_encoding import compact_design_context, prompt_encoding
 
 load_dotenv()
 
-async def generate_html_clone(scrape_data: Dict[str, Any]) -> str:
-    """Generate HTML clone using Claude AI based on scraped data"""
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ANTHROPIC_BASE_URL points the client at a proxy or a local stub server
+CLAUDE_API_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/") + "/v1/messages"
+
+# One pooled session for the app's lifetime: keep-alive connections and cached DNS instead of a handshake per call
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Shared Claude API session, created lazily on the running event loop."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "20")),
+            keepalive_timeout=float(os.getenv("ANTHROPIC_KEEPALIVE_SECONDS", "60")),
+            ttl_dns_cache=int(os.getenv("ANTHROPIC_DNS_CACHE_SECONDS", "300")),
+            enable_cleanup_closed=True
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "300")))
+        )
+    return _session
+
+async def warm_up_session():
+    """Resolve DNS and open a keep-alive connection to the Claude API before the first clone needs it."""
+    if not os.getenv("ANTHROPIC_API_KEY"):
+        return
+    # Startup waits for this, so it gets a short timeout rather than the session's long request timeout
+    timeout = aiohttp.ClientTimeout(total=float(os.getenv("ANTHROPIC_WARMUP_TIMEOUT_SECONDS", "5")))
     try:
-        prompt = _create_prompt(scrape_data)
-        html = await _call_claude_api(prompt)
-        return html
+        async with get_session().head(CLAUDE_API_URL, timeout=timeout) as response:
+            await response.read()
+        logger.info("Claude API connection warmed up")
     except Exception as e:
-        raise Exception(f"Failed to generate HTML: {str(e)}")
+        logger.warning(f"Claude API warm-up failed: {str(e)}")
 
-def _create_prompt(scrape_data: Dict[str, Any]) -> str:
-    prompt = f"""
-You are an expert web developer. Given the following website design context, generate a complete, production-ready, responsive HTML file that closely matches the original site's look and feel. Use modern HTML5, CSS3, and semantic elements. Include all CSS in a <style> tag in the <head>. Make sure the result is mobile-friendly and includes meta tags for SEO and viewport.
+async def close_session():
+    """Close the shared session; called from the app's lifespan on shutdown."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
 
-Title: {scrape_data['title']}
+def pool_stats() -> Dict[str, Optional[int]]:
+    """Connections held by the shared session's pool, active and total.
 
-Design Context:
-- Colors: {json.dumps(scrape_data['colors'], indent=2)}
-- Layout: {json.dumps(scrape_data['layout'], indent=2)}
-- Components: {json.dumps(scrape_data['components'], indent=2)}
-- Typography: {json.dumps(scrape_data['typography'], indent=2)}
-- Structure: {json.dumps(scrape_data['structure'], indent=2)}
+    aiohttp does not expose these, so they are read from private attributes and are None
+    when those are unavailable.
+    """
+    connector = _session.connector if _session is not None and not _session.closed else None
+    if connector is None:
+        return {'in_use': 0, 'open': 0}
+    try:
+        in_use = sum(len(conns) for conns in connector._acquired_per_host.values())
+        idle = sum(len(conns) for conns in connector._conns.values())
+    except (AttributeError, TypeError):
+        return {'in_use': None, 'open': None}
+    return {'in_use': in_use, 'open': in_use + idle}
+
+async def generate_html_clone(scrape_data: Dict[str, Any],
+                              on_delta: Optional[Callable[[int, str], None]] = None,
+                              use_cache: bool = True, encoding: Optional[str] = None) -> str:
+    """Generate HTML clone using Claude AI based on scraped data.
+
+    With on_delta the response is streamed and on_delta(offset, text) receives each text delta.
+    use_cache=False bypasses the completion cache. encoding ('json' or 'compact') overrides the
+    design-context encoding configured for the anthropic provider.
+    """
+    try:
+        prompt = _create_prompt(scrape_data, encoding or prompt_encoding("anthropic"))
+        html = await _call_claude_api(prompt, on_delta=on_delta, use_cache=use_cache)
+        return html
+    except Exception as e:
+        raise Exception(f"Failed to generate HTML: {str(e)}")
+
+# Static prompt prefix sent as the system prompt; complete_messages marks it for provider-side prompt
+# caching once it is long enough to be cached
+CLONE_INSTRUCTIONS = """You are an expert web developer. Given the following website design context, generate a complete, production-ready, responsive HTML file that closely matches the original site's look and feel. Use modern HTML5, CSS3, and semantic elements. Include all CSS in a <style> tag in the <head>. Make sure the result is mobile-friendly and includes meta tags for SEO and viewport.
 
 Requirements:
 1. Use modern HTML5 and CSS3
@@ -40,33 +104,140 @@ Requirements:
 9. Match the layout structure precisely
 10. Include all detected components
 
-Output ONLY the HTML code, nothing else.
+Output ONLY the HTML code, nothing else. The design context follows in the user message."""
+
+DESIGN_FIELDS = ('colors', 'layout', 'components', 'typography', 'structure')
+
+def _create_prompt(scrape_data: Dict[str, Any], encoding: str = "json") -> str:
+    """Per-site part of the prompt; the shared instructions are CLONE_INSTRUCTIONS.
+
+    'json' embeds each design field as indented JSON; 'compact' uses compact_design_context.
+    """
+    if encoding == "compact":
+        context = compact_design_context({field: scrape_data[field] for field in DESIGN_FIELDS})
+        return f"""
+Title: {scrape_data['title']}
+
+Design Context:
+{context}
+"""
+    prompt = f"""
+Title: {scrape_data['title']}
+
+Design Context:
+- Colors: {json.dumps(scrape_data['colors'], indent=2)}
+- Layout: {json.dumps(scrape_data['layout'], indent=2)}
+- Components: {json.dumps(scrape_data['components'], indent=2)}
+- Typography: {json.dumps(scrape_data['typography'], indent=2)}
+- Structure: {json.dumps(scrape_data['structure'], indent=2)}
 """
     return prompt
 
-async def _call_claude_api(prompt: str) -> str:
+CLAUDE_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-opus-20240229")
+
+async def _call_claude_api(prompt: str, on_delta: Optional[Callable[[int, str], None]] = None,
+                           use_cache: bool = True) -> str:
+    messages = [{"role": "system", "content": CLONE_INSTRUCTIONS}, {"role": "user", "content": prompt}]
+    cache = get_completion_cache()
+    # Keyed like the provider router's entries, so both paths share cached completions
+    key = completion_key(f"anthropic/{CLAUDE_MODEL}", messages, 0.7, 4000)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            record(llm_cache_hits=1)
+            if on_delta is not None:
+                on_delta(0, cached)
+            return cached
+
+    text = await complete_messages(messages, max_tokens=4000, temperature=0.7, on_delta=on_delta)
+    cache.put(key, text)
+    return text
+
+# The Messages API ignores cache_control on shorter prefixes (1024 tokens on Sonnet and Opus, 2048 on Haiku)
+CACHE_MIN_TOKENS = int(os.getenv("ANTHROPIC_CACHE_MIN_TOKENS", "1024"))
+
+def system_blocks(system: str) -> List[Dict[str, Any]]:
+    """System prompt as content blocks, marked as a prompt-cache breakpoint when it is long enough to be cached."""
+    block: Dict[str, Any] = {"type": "text", "text": system}
+    if count_tokens(system) >= CACHE_MIN_TOKENS:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
+async def complete_messages(messages: List[Dict[str, Any]], max_tokens: int = 4000, temperature: float = 0.7,
+                            model: Optional[str] = None,
+                            on_delta: Optional[Callable[[int, str], None]] = None,
+                            timeout: Optional[float] = None) -> str:
+    """One Messages API completion for chat-style messages; system messages become the system prompt.
+
+    The system prompt is the static prefix shared across sites, so it is marked as a
+    prompt-cache breakpoint when it reaches CACHE_MIN_TOKENS. Token usage, including cache reads and writes, is recorded
+    on the current job. timeout (seconds) overrides the session's total timeout for this request.
+    """
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         raise Exception("Anthropic API key not found in environment variables")
 
-    url = "https://api.anthropic.com/v1/messages"
     headers = {
         "x-api-key": api_key,
         "anthropic-version": "2023-06-01",
         "content-type": "application/json"
     }
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
     data = {
-        "model": "claude-3-opus-20240229",
-        "max_tokens": 4000,
-        "temperature": 0.7,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
+        "model": model or CLAUDE_MODEL,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [m for m in messages if m["role"] != "system"],
+        "stream": on_delta is not None
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                raise Exception(f"Claude API error: {await response.text()}")
+    if system:
+        data["system"] = system_blocks(system)
+    # Passing timeout=None would disable the session timeout, so only pass one when given
+    options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout is not None else {}
+    async with get_session().post(CLAUDE_API_URL, headers=headers, json=data, **options) as response:
+        if response.status != 200:
+            raise Exception(f"Claude API error: {await response.text()}")
+        if on_delta is not None:
+            usage: Dict[str, int] = {}
+            text = await _read_claude_stream(response, on_delta, usage)
+        else:
             result = await response.json()
+            usage = result.get("usage", {})
             # Claude's response is in result['content'][0]['text']
-            return result["content"][0]["text"] 
\ No newline at end of file
+            text = result["content"][0]["text"]
+    _record_usage(usage)
+    return text
+
+def _record_usage(usage: Dict[str, Any]):
+    record(
+        llm_calls=1,
+        prompt_tokens=usage.get("input_tokens") or 0,
+        completion_tokens=usage.get("output_tokens") or 0,
+        prompt_cache_read_tokens=usage.get("cache_read_input_tokens") or 0,
+        prompt_cache_write_tokens=usage.get("cache_creation_input_tokens") or 0
+    )
+
+async def _read_claude_stream(response: aiohttp.ClientResponse, on_delta: Callable[[int, str], None],
+                              usage: Optional[Dict[str, int]] = None) -> str:
+    """Parse the Messages API event stream, forwarding text deltas as they arrive and collecting usage."""
+    pieces = []
+    offset = 0
+    async for line in response.content:
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            continue
+        event = json.loads(line[5:])
+        if event.get("type") == "error":
+            raise Exception(f"Claude API error: {event.get('error')}")
+        if usage is not None and event.get("type") == "message_start":
+            usage.update(event["message"].get("usage") or {})
+        if usage is not None and event.get("type") == "message_delta":
+            usage.update(event.get("usage") or {})
+        if event.get("type") != "content_block_delta":
+            continue
+        text = event["delta"].get("text")
+        if text:
+            on_delta(offset, text)
+            pieces.append(text)
+            offset += len(text)
+    return "".join(pieces)
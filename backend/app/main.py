@@ -1,16 +1,29 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import asyncio
+from contextlib import asynccontextmanager
 import aiohttp
 import base64
 import json
+import math
 import os
 from datetime import datetime
 import uuid
 from .scraper import WebScraper
 from .llm import LLMGenerator
+from . import llm_generator as claude_client
+from .job_store import create_job_store, TERMINAL_STATUSES
+from .job_queue import create_job_queue, QueueFullError
+from .events import JobEventBus, PartialOutput, format_sse
+from .coalescing import RequestCoalescer, coalescing_key
+from .result_cache import create_result_cache, design_fingerprint
+from .batches import BatchScheduler
+from .instrumentation import JobMetrics, StageStats, track_job
+from .metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .responses import compute_etag, encoded_etag, etag_matches, negotiate_encoding, encode_chunks, poll_retry_after
 import logging
 
 # Set up logging
@@ -26,10 +39,24 @@ except Exception as e:
     logger.error(f"Failed to initialize LLMGenerator: {str(e)}")
     raise
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    await claude_client.warm_up_session()
+    yield
+    await batch_scheduler.stop()
+    await job_queue.stop()
+    # Release shared clients and storage on shutdown
+    await scraper.close()
+    await llm_generator.close()
+    await claude_client.close_session()
+    job_store.close()
+
 app = FastAPI(
     title="AI Website Cloner API",
     description="API for cloning website aesthetics using LLM",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -45,12 +72,29 @@ app.add_middleware(
 class CloneRequest(BaseModel):
     url: str
     output_dir: Optional[str] = "output"
+    force_refresh: bool = False
     
 class CloneResponse(BaseModel):
     job_id: str
     status: str
     message: str
 
+class BatchCloneRequest(BaseModel):
+    urls: List[str]
+    output_dir: Optional[str] = "output"
+    force_refresh: bool = False
+
+class BatchStatus(BaseModel):
+    id: str
+    status: str
+    total: int
+    queued: int
+    running: int
+    completed: int
+    failed: int
+    cancelled: int = 0
+    progress: int
+
 class CloneStatus(BaseModel):
     id: str
     status: str
@@ -58,72 +102,547 @@ class CloneStatus(BaseModel):
     message: str
     html: Optional[str] = None
     error: Optional[str] = None
+    queue_position: Optional[int] = None
+    eta_seconds: Optional[float] = None
+    result_url: Optional[str] = None
+    metrics: Optional[Dict[str, Any]] = None
+    partial: Optional[Dict[str, str]] = None
+
+# Job storage (memory LRU/TTL or SQLite, see JOB_STORE_BACKEND)
+job_store = create_job_store()
+
+# Progress fan-out for GET /clone/{job_id}/events
+event_bus = JobEventBus()
+SSE_KEEPALIVE_SECONDS = 15
+
+# Streamed LLM output of running jobs, keyed by the job that runs the pipeline
+partial_output = PartialOutput()
+
+# Singleflight: identical in-flight requests attach to one pipeline run
+coalescer = RequestCoalescer()
 
-# In-memory storage (in production, use Redis or database)
-clone_jobs: Dict[str, Dict[str, Any]] = {}
+# Completed results keyed by normalized URL + design fingerprint
+result_cache = create_result_cache()
+
+# Global cap on concurrent LLM generations across all jobs
+llm_semaphore = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
+
+# Rolling per-stage latency of finished jobs for GET /stats/stages
+stage_stats = StageStats(window=int(os.getenv("STAGE_STATS_WINDOW", "1000")))
+
+# Prometheus-style metrics for GET /metrics
+metrics_registry = Registry()
+stage_latency = metrics_registry.histogram(
+    "clone_stage_duration_seconds", "Wall time of each clone pipeline stage", ["stage"]
+)
+jobs_finished = metrics_registry.counter(
+    "clone_jobs_total", "Clone jobs by terminal status", ["status"]
+)
+llm_retries = metrics_registry.counter(
+    "llm_retries_total", "Retried LLM requests"
+)
+llm_tokens = metrics_registry.counter(
+    "llm_tokens_total", "LLM tokens by kind", ["kind"]
+)
+
+READY_MAX_QUEUE_FRACTION = float(os.getenv("READY_MAX_QUEUE_FRACTION", "0.8"))
+READY_MAX_LLM_P95_SECONDS = float(os.getenv("READY_MAX_LLM_P95_SECONDS", "120"))
+
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "10000"))
 
 @app.get("/")
 async def root():
     return {"message": "Website Cloner API", "status": "running"}
 
 @app.post("/clone", response_model=CloneResponse)
-async def clone_website(request: CloneRequest, background_tasks: BackgroundTasks):
+async def clone_website(request: CloneRequest):
     job_id = str(uuid.uuid4())
-    clone_jobs[job_id] = {
+    key = coalescing_key(request.url, output_dir=request.output_dir, force_refresh=request.force_refresh)
+    leader_id = coalescer.leader_for(key)
+    if leader_id is not None:
+        leader = job_store.get(leader_id, include_html=False)
+        if leader is None or leader["status"] in TERMINAL_STATUSES:
+            # Never mirror a run that has already ended; start a fresh one instead
+            coalescer.release(leader_id)
+        else:
+            job_store.create({
+                "id": job_id,
+                "status": leader["status"],
+                "progress": leader["progress"],
+                "message": leader["message"],
+                "html": None,
+                "error": None,
+                "coalesced_with": leader_id
+            })
+            coalescer.follow(leader_id, job_id)
+            return CloneResponse(
+                job_id=job_id,
+                status=leader["status"],
+                message="Attached to an in-flight clone of the same URL"
+            )
+
+    job_store.create({
         "id": job_id,
         "status": "queued",
         "progress": 0,
         "message": "Job queued",
         "html": None,
         "error": None
-    }
-    background_tasks.add_task(process_clone_job, job_id, request.url, request.output_dir)
+    })
+    try:
+        position = job_queue.submit(job_id, request.url, request.output_dir, request.force_refresh)
+    except QueueFullError as e:
+        job_store.delete(job_id)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    coalescer.lead(key, job_id)
     return CloneResponse(
         job_id=job_id,
         status="queued",
-        message="Cloning started in background"
+        message=f"Job queued at position {position}"
     )
 
-@app.get("/clone/{job_id}", response_model=CloneStatus)
-async def get_clone_status(job_id: str):
-    if job_id not in clone_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    job = clone_jobs[job_id]
+def _build_status(job: Dict[str, Any], include_html: bool = True, include_partial: bool = False) -> CloneStatus:
+    # Coalesced jobs report the queue state and streamed output of the run they mirror
+    runner_id = job.get("coalesced_with") or job["id"]
+    partial = None
+    if include_partial and job["status"] not in TERMINAL_STATUSES:
+        partial = partial_output.get(runner_id)
     return CloneStatus(
         id=job["id"],
         status=job["status"],
         progress=job["progress"],
         message=job["message"],
-        html=job.get("html"),
-        error=job.get("error")
+        html=job.get("html") if include_html else None,
+        error=job.get("error"),
+        queue_position=job_queue.position(runner_id),
+        eta_seconds=job_queue.eta(runner_id),
+        result_url=f"/clone/{job['id']}/result" if job["status"] == "completed" else None,
+        metrics=job.get("metrics"),
+        partial=partial
+    )
+
+def _update_job(job_id: str, **fields):
+    """Persist a job update, mirror it to coalesced followers and push it to event subscribers."""
+    for target_id in coalescer.targets(job_id):
+        job = job_store.update(target_id, **fields)
+        if job is not None and event_bus.has_subscribers(target_id):
+            event_bus.publish(target_id, "status", _build_status(job, include_html=False).model_dump(exclude={"html"}))
+
+@app.get("/clone/{job_id}", response_model=CloneStatus)
+async def get_clone_status(job_id: str, response: Response, include_html: bool = True, include_partial: bool = False):
+    """
+    Job status; pass include_html=false for a slim poll and fetch the HTML from result_url.
+    include_partial=true adds the LLM output streamed so far while the job runs.
+    """
+    job = job_store.get(job_id, include_html=include_html)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    status = _build_status(job, include_html=include_html, include_partial=include_partial)
+    if job["status"] not in TERMINAL_STATUSES:
+        response.headers["Retry-After"] = str(poll_retry_after(status.eta_seconds))
+    return status
+
+@app.get("/clone/{job_id}/result")
+async def get_clone_result(job_id: str, request: Request):
+    """Stream the generated HTML with ETag revalidation and gzip/brotli compression."""
+    job = job_store.get(job_id, include_html=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        headers = {}
+        if job["status"] not in TERMINAL_STATUSES:
+            runner_id = job.get("coalesced_with") or job_id
+            headers["Retry-After"] = str(poll_retry_after(job_queue.eta(runner_id)))
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}", headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    etag = job.get("html_etag")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag:
+        etag = encoded_etag(etag, encoding)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    chunks = job_store.iter_html(job_id)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(encode_chunks(chunks, encoding), media_type="text/html; charset=utf-8", headers=headers)
+
+def _mark_cancelled(job_id: str):
+    job = job_store.update(job_id, status="cancelled", message="Job cancelled")
+    if job is not None and event_bus.has_subscribers(job_id):
+        event_bus.publish(job_id, "status", _build_status(job, include_html=False).model_dump(exclude={"html"}))
+
+@app.delete("/clone/{job_id}", response_model=CloneStatus)
+async def cancel_clone(job_id: str):
+    """Cancel a queued or running job, aborting its in-flight fetch, LLM request and retry waits."""
+    job = job_store.get(job_id, include_html=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+
+    leader_id = job.get("coalesced_with")
+    if leader_id is not None:
+        # A follower just stops mirroring; the shared run is cancelled once nobody needs it
+        coalescer.unfollow(leader_id, job_id)
+        if coalescer.is_detached(leader_id) and not coalescer.followers(leader_id):
+            job_queue.cancel(leader_id)
+            coalescer.release(leader_id)
+    elif coalescer.followers(job_id):
+        # Other requests are attached to this run, so keep it going for them
+        coalescer.detach(job_id)
+    else:
+        job_queue.cancel(job_id)
+        # A queued job never reaches the worker's cleanup, so forget its key here
+        coalescer.release(job_id)
+    _mark_cancelled(job_id)
+    return _build_status(job_store.get(job_id, include_html=False), include_html=False)
+
+@app.get("/clone/{job_id}/events")
+async def stream_clone_events(job_id: str, request: Request):
+    """Server-Sent Events stream of status transitions, token deltas and partial artifacts."""
+    job = job_store.get(job_id, include_html=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def snapshot() -> Dict[str, Any]:
+        # The snapshot carries the output streamed so far and later deltas continue from it
+        current = job_store.get(job_id, include_html=False) or job
+        return _build_status(current, include_html=False, include_partial=True).model_dump(exclude={"html"})
+
+    async def event_stream():
+        queue = event_bus.subscribe(job_id)
+        try:
+            # Taken after subscribing so no update between the lookup above and the
+            # subscription is lost
+            current = snapshot()
+            yield format_sse("status", current)
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["event"] == JobEventBus.RESYNC:
+                    # Events were dropped for this slow client; replace its state wholesale
+                    event = {"event": "status", "data": snapshot()}
+                yield format_sse(event["event"], event["data"])
+                if event["event"] == "status" and event["data"]["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            event_bus.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-def process_clone_job(job_id: str, url: str, output_dir: str):
+def _complete_job(job_id: str, code: Dict[str, str], message: str, **fields):
+    html = code.get("html")
+    _update_job(
+        job_id,
+        status="completed",
+        progress=100,
+        message=message,
+        html=html,
+        html_etag=compute_etag(html) if html is not None else None,
+        **fields
+    )
+
+async def _complete_from_cache(job_id: str, code: Dict[str, str], output_dir: str, metrics: JobMetrics):
+    await llm_generator.save_generated_code_async(code, output_dir)
+    _complete_job(job_id, code, "Website cloned successfully (cached result).", metrics=metrics.as_dict())
+
+async def process_clone_job(job_id: str, url: str, output_dir: str, force_refresh: bool = False):
+    def publish_artifact(artifact: str, content: str):
+        partial_output.finish(job_id, artifact, content)
+        for target_id in coalescer.targets(job_id):
+            event_bus.publish(target_id, "partial", {"artifact": artifact, "content": content})
+
+    def publish_delta(artifact: str, offset: int, text: str):
+        partial_output.append(job_id, artifact, offset, text)
+        for target_id in coalescer.targets(job_id):
+            if event_bus.has_subscribers(target_id):
+                event_bus.publish(target_id, "delta", {"artifact": artifact, "offset": offset, "text": text})
+
+    metrics = JobMetrics()
+    final_status = "completed"
     try:
-        clone_jobs[job_id]["status"] = "scraping"
-        clone_jobs[job_id]["progress"] = 10
-        clone_jobs[job_id]["message"] = "Scraping website..."
-        scraped_data = scraper.scrape_website(url)
-
-        clone_jobs[job_id]["status"] = "generating"
-        clone_jobs[job_id]["progress"] = 50
-        clone_jobs[job_id]["message"] = "Generating code with LLM..."
-        generated_code = llm_generator.generate_website_code(scraped_data)
-
-        clone_jobs[job_id]["status"] = "saving"
-        clone_jobs[job_id]["progress"] = 80
-        clone_jobs[job_id]["message"] = "Saving generated code..."
-        llm_generator.save_generated_code(generated_code, output_dir)
-
-        clone_jobs[job_id]["status"] = "completed"
-        clone_jobs[job_id]["progress"] = 100
-        clone_jobs[job_id]["message"] = "Website cloned successfully."
-        clone_jobs[job_id]["html"] = generated_code.get("html")
+        with track_job(metrics):
+            await _run_pipeline(job_id, url, output_dir, force_refresh, metrics, publish_artifact, publish_delta)
+    except asyncio.CancelledError:
+        final_status = "cancelled"
+        _update_job(job_id, status="cancelled", message="Job cancelled", metrics=metrics.as_dict())
+        raise
     except Exception as e:
-        clone_jobs[job_id]["status"] = "failed"
-        clone_jobs[job_id]["progress"] = 100
-        clone_jobs[job_id]["message"] = f"Error: {str(e)}"
-        clone_jobs[job_id]["error"] = str(e)
+        final_status = "failed"
+        _update_job(
+            job_id,
+            status="failed",
+            progress=100,
+            message=f"Error: {str(e)}",
+            error=str(e),
+            metrics=metrics.as_dict()
+        )
+    finally:
+        _observe_job(metrics, final_status)
+        partial_output.clear(job_id)
+        coalescer.release(job_id)
+
+def _observe_job(metrics: JobMetrics, status: str):
+    stage_stats.observe(metrics)
+    for name, seconds in metrics.stages.items():
+        stage_latency.observe(seconds, name)
+    jobs_finished.inc(status)
+    if metrics.counters["llm_retries"]:
+        llm_retries.inc(amount=metrics.counters["llm_retries"])
+    llm_tokens.inc("prompt", amount=metrics.counters["prompt_tokens"])
+    llm_tokens.inc("completion", amount=metrics.counters["completion_tokens"])
+
+async def _run_pipeline(job_id: str, url: str, output_dir: str, force_refresh: bool,
+                        metrics: JobMetrics, publish_artifact, publish_delta):
+    if not force_refresh:
+        cached = result_cache.get_recent(url)
+        if cached is not None:
+            await _complete_from_cache(job_id, cached, output_dir, metrics)
+            return
+
+    _update_job(job_id, status="scraping", progress=10, message="Scraping website...", metrics=metrics.as_dict())
+    scraped_data = await scraper.scrape_website_async(url)
+    fingerprint = design_fingerprint(scraped_data)
+
+    if not force_refresh:
+        cached = result_cache.get(url, fingerprint)
+        if cached is not None:
+            await _complete_from_cache(job_id, cached, output_dir, metrics)
+            return
+
+    _update_job(job_id, status="generating", progress=50, message="Generating code with LLM...", metrics=metrics.as_dict())
+    async with llm_semaphore:
+        generated_code = await llm_generator.generate_website_code_async(
+            scraped_data, on_artifact=publish_artifact, on_delta=publish_delta, use_cache=not force_refresh
+        )
+    failed = generated_code.pop("failed", [])
+    fallback = generated_code.pop("fallback", [])
+    if not failed and not fallback:
+        # Partial and template results are not cached so the next request retries the LLM
+        result_cache.put(url, fingerprint, generated_code)
+
+    _update_job(job_id, status="saving", progress=80, message="Saving generated code...", metrics=metrics.as_dict())
+    await llm_generator.save_generated_code_async(generated_code, output_dir)
+
+    message = "Website cloned successfully."
+    if failed:
+        message = f"Website cloned without {', '.join(failed)} (generation failed)."
+    if fallback:
+        message = (f"{message[:-1]}; {', '.join(fallback)} built from a basic template "
+                   f"because no LLM provider answered (not cached).")
+    _complete_job(job_id, generated_code, message, metrics=metrics.as_dict())
+
+# Worker pool draining the clone queue (see CLONE_WORKERS / CLONE_QUEUE_*)
+job_queue = create_job_queue(process_clone_job, on_skip=coalescer.release)
+
+async def _run_batch_job(job_id: str, url: str, output_dir: str, force_refresh: bool) -> str:
+    # A job cancelled while it waited for a per-host slot is not in the queue yet,
+    # so DELETE only marked it; do not run it anyway
+    job = job_store.get(job_id, include_html=False)
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        return job["status"] if job else "failed"
+    # Each batch job writes to its own directory so results do not overwrite each other
+    await job_queue.run(job_id, url, os.path.join(output_dir, job_id), force_refresh)
+    job = job_store.get(job_id, include_html=False)
+    return job["status"] if job else "failed"
+
+batch_scheduler = BatchScheduler(
+    _run_batch_job,
+    per_host_limit=int(os.getenv("BATCH_PER_HOST_CONCURRENCY", "2")),
+    max_batches=int(os.getenv("BATCH_MAX_TRACKED", "100"))
+)
+
+@app.post("/clone/batch", response_model=BatchStatus)
+async def clone_batch(request: BatchCloneRequest):
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_URLS} URLs")
+    job_ids = []
+    for _ in request.urls:
+        job_id = str(uuid.uuid4())
+        job_store.create({
+            "id": job_id,
+            "status": "queued",
+            "progress": 0,
+            "message": "Job queued",
+            "html": None,
+            "error": None
+        })
+        job_ids.append(job_id)
+    batch = batch_scheduler.create(job_ids, request.urls, request.output_dir, request.force_refresh)
+    return BatchStatus(**batch.summary())
+
+@app.get("/clone/batch/{batch_id}", response_model=BatchStatus)
+async def get_batch_status(batch_id: str):
+    batch = batch_scheduler.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return BatchStatus(**batch.summary())
+
+@app.get("/clone/batch/{batch_id}/results")
+async def get_batch_results(batch_id: str, offset: int = 0, limit: int = 100):
+    batch = batch_scheduler.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), 500)
+    items = []
+    for job_id, url in zip(batch.job_ids[offset:offset + limit], batch.urls[offset:offset + limit]):
+        job = job_store.get(job_id, include_html=False)
+        item = _build_status(job, include_html=False).model_dump(exclude={"html"}) if job else {"id": job_id, "status": "expired"}
+        item["url"] = url
+        items.append(item)
+    return {
+        "batch_id": batch_id,
+        "offset": offset,
+        "limit": limit,
+        "total": batch.total,
+        "items": items
+    }
+
+metrics_registry.gauge("clone_jobs_in_flight", "Clone jobs currently running", lambda: job_queue.in_flight)
+metrics_registry.gauge(
+    "clone_jobs_queued", "Clone jobs waiting in the queue, by lane",
+    lambda: {("interactive",): job_queue.depth, ("batch",): job_queue.batch_depth}, ["lane"]
+)
+metrics_registry.gauge("clone_job_seconds_estimate", "Moving average of clone job duration", lambda: job_queue.avg_job_seconds)
+metrics_registry.gauge("job_store_jobs", "Jobs held by the job store", lambda: len(job_store))
+metrics_registry.gauge("job_store_size_bytes", "Approximate bytes held by the job store", lambda: job_store.size_bytes)
+metrics_registry.callback_counter(
+    "result_cache_requests_total", "Result cache lookups by outcome",
+    lambda: {("hit",): result_cache.stats()["hits"], ("miss",): result_cache.stats()["misses"]}, ["outcome"]
+)
+metrics_registry.callback_counter(
+    "completion_cache_requests_total", "LLM completion cache lookups by outcome",
+    lambda: {
+        ("hit",): llm_generator.completion_cache.stats()["hits"],
+        ("miss",): llm_generator.completion_cache.stats()["misses"]
+    }, ["outcome"]
+)
+metrics_registry.gauge(
+    "completion_cache_hit_ratio", "Share of LLM completion cache lookups that hit",
+    lambda: llm_generator.completion_cache.stats()["hit_rate"]
+)
+def _connections_in_use():
+    # Clients whose pool internals are unavailable report None and are left out
+    in_use = {
+        ("scraper",): scraper.pool_stats()["in_use"],
+        ("openai",): llm_generator.pool_stats()["in_use"],
+        ("anthropic",): claude_client.pool_stats()["in_use"]
+    }
+    return {labels: value for labels, value in in_use.items() if value is not None}
+
+metrics_registry.gauge(
+    "outbound_connections_in_use", "Outbound HTTP connections in use by client", _connections_in_use, ["client"]
+)
+metrics_registry.gauge(
+    "llm_concurrency_limit", "Adaptive limit on concurrent LLM requests",
+    lambda: llm_generator.rate_limiter.stats()["concurrency_limit"]
+)
+metrics_registry.callback_counter(
+    "llm_rate_limited_total", "LLM responses rejected with 429",
+    lambda: llm_generator.rate_limiter.stats()["rate_limited"]
+)
+metrics_registry.callback_counter(
+    "llm_rate_limit_wait_seconds_total", "Time spent waiting for LLM rate-limit budget",
+    lambda: llm_generator.rate_limiter.stats()["waited_seconds"]
+)
+metrics_registry.gauge(
+    "llm_provider_latency_seconds", "Rolling median completion latency by LLM provider",
+    lambda: {
+        (name,): stats["p50_seconds"] or 0.0
+        for name, stats in llm_generator.router.summary()["providers"].items()
+    }, ["provider"]
+)
+metrics_registry.gauge(
+    "llm_provider_error_rate", "Rolling error rate by LLM provider",
+    lambda: {(name,): stats["error_rate"] for name, stats in llm_generator.router.summary()["providers"].items()},
+    ["provider"]
+)
+metrics_registry.gauge(
+    "llm_provider_circuit_open", "1 while the provider's circuit breaker is open",
+    lambda: {
+        (name,): int(stats["circuit_open"])
+        for name, stats in llm_generator.router.summary()["providers"].items()
+    }, ["provider"]
+)
+metrics_registry.callback_counter(
+    "llm_template_fallbacks_total", "LLM calls answered by template generation after every provider failed",
+    lambda: llm_generator.router.fallbacks
+)
+metrics_registry.callback_counter(
+    "llm_hedged_requests_total", "Duplicate LLM requests issued by hedging, by outcome",
+    lambda: {
+        ("won",): llm_generator.router.hedge_wins,
+        ("lost",): llm_generator.router.hedges - llm_generator.router.hedge_wins
+    }, ["outcome"]
+)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness():
+    """Deep readiness probe: degraded when the queue backs up or LLM calls are slow.
+
+    A backed-up queue answers 503. Slow LLM stages report "degraded" with a 200:
+    their p95 covers the last jobs, so failing the probe would keep an idle pod
+    out of rotation with nothing to clear it.
+    """
+    reasons = []
+    if job_queue.depth >= READY_MAX_QUEUE_FRACTION * job_queue.max_depth:
+        reasons.append(f"queue depth {job_queue.depth} of {job_queue.max_depth}")
+    if job_queue.estimate_wait(job_queue.depth + 1) > job_queue.slo_seconds:
+        reasons.append("estimated queue wait exceeds SLO")
+    warnings = [
+        f"{name} p95 latency {summary['p95']:.1f}s"
+        for name, summary in stage_stats.summary()["stages"].items()
+        if name.startswith("llm_") and summary["p95"] > READY_MAX_LLM_P95_SECONDS
+    ]
+    body = {
+        "status": "degraded" if reasons or warnings else "ready",
+        "reasons": reasons,
+        "warnings": warnings,
+        "queued": job_queue.depth,
+        "in_flight": job_queue.in_flight
+    }
+    return JSONResponse(body, status_code=503 if reasons else 200)
+
+@app.get("/stats/stages")
+async def get_stage_stats():
+    """Aggregate stage latency percentiles and counters over recently finished jobs."""
+    return stage_stats.summary()
+
+@app.get("/llm/providers")
+async def llm_provider_stats():
+    """Rolling latency, error rate and circuit state of each LLM provider."""
+    return llm_generator.router.summary()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"result_cache": result_cache.stats(), "completion_cache": llm_generator.completion_cache.stats()}
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,127 @@
+from typing import Dict, List, Sequence, Union
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to ~4 characters per token
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = "…"
+
+_encodings: Dict[str, object] = {}
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Token count of text for the model, estimated from its length when tiktoken is unavailable."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> str:
+    """Longest prefix of text that fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+class PromptSection:
+    """Named prompt field made of items ordered from most to least salient."""
+
+    def __init__(self, name: str, items: Sequence[str], weight: float, separator: str):
+        self.name = name
+        self.items = [item for item in items if item]
+        self.weight = weight
+        self.separator = separator
+
+
+class PromptBuilder:
+    """Packs prompt fields into a fixed token budget.
+
+    The budget is shared across sections in proportion to their weights; a
+    section that needs less than its share hands the rest to the others. Each
+    section then keeps whole items in order until its allotment is spent, so
+    the most salient content always survives and the prompt size is bounded.
+    """
+
+    def __init__(self, budget_tokens: int, model: str = "gpt-4", min_partial_tokens: int = 8):
+        self.budget_tokens = budget_tokens
+        self.model = model
+        self.min_partial_tokens = min_partial_tokens
+        self.sections: List[PromptSection] = []
+
+    def add(self, name: str, content: Union[str, Sequence[str]], weight: float = 1.0,
+            separator: str = ", ") -> "PromptBuilder":
+        items = [content] if isinstance(content, str) else list(content)
+        self.sections.append(PromptSection(name, items, weight, separator))
+        return self
+
+    def _need(self, section: PromptSection) -> int:
+        # Counted the same way _pack spends tokens: items plus the separators between them
+        if not section.items:
+            return 0
+        separator_tokens = count_tokens(section.separator, self.model) if section.separator else 0
+        return sum(count_tokens(item, self.model) for item in section.items) + separator_tokens * (len(section.items) - 1)
+
+    def allocate(self) -> Dict[str, int]:
+        """Token allotment per section (weighted water-filling over the budget)."""
+        needs = {section.name: self._need(section) for section in self.sections}
+        allotment = {section.name: 0 for section in self.sections}
+        active = [section for section in self.sections if needs[section.name] > 0]
+        remaining = self.budget_tokens
+        while active and remaining > 0:
+            total_weight = sum(section.weight for section in active)
+            shares = {section.name: remaining * section.weight / total_weight for section in active}
+            satisfied = [s for s in active if needs[s.name] - allotment[s.name] <= shares[s.name]]
+            if not satisfied:
+                for section in active:
+                    allotment[section.name] += int(shares[section.name])
+                break
+            for section in satisfied:
+                remaining -= needs[section.name] - allotment[section.name]
+                allotment[section.name] = needs[section.name]
+                active.remove(section)
+        return allotment
+
+    def _pack(self, section: PromptSection, budget: int) -> str:
+        packed: List[str] = []
+        used = 0
+        separator_tokens = count_tokens(section.separator, self.model) if section.separator else 0
+        for item in section.items:
+            cost = count_tokens(item, self.model) + (separator_tokens if packed else 0)
+            if used + cost <= budget:
+                packed.append(item)
+                used += cost
+                continue
+            room = budget - used - (separator_tokens if packed else 0)
+            if room >= self.min_partial_tokens or not packed:
+                partial = truncate_to_tokens(item, room - 1, self.model)
+                if partial:
+                    packed.append(partial + TRUNCATION_MARK)
+            break
+        return section.separator.join(packed)
+
+    def build(self) -> Dict[str, str]:
+        """Render every section within its allotment, keyed by section name."""
+        allotment = self.allocate()
+        return {section.name: self._pack(section, allotment[section.name]) for section in self.sections}
+
+
+# Generous chars-per-token bound used to cap a layout section's text before token packing
+MAX_CHARS_PER_TOKEN = 8
@@ -0,0 +1,134 @@
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, List
+
+ENCODINGS = ('json', 'compact')
+
+# Short names for the scraper's design-context keys; unknown keys are kept as they are
+KEY_ALIASES = {
+    'colors': 'c', 'primary': 'pri', 'background': 'bg', 'text': 'fg', 'all_colors': 'all',
+    'layout': 'l', 'container_classes': 'cc', 'grid_system': 'grid', 'max_width': 'mw', 'layout_type': 'type',
+    'components': 'cmp',
+    'typography': 't', 'fonts': 'ff', 'font_sizes': 'fs', 'line_heights': 'lh', 'font_weights': 'fw',
+    'headings': 'hd',
+    'structure': 's', 'has_header': 'hdr', 'has_footer': 'ftr', 'has_sidebar': 'side',
+    'main_sections': 'secs', 'heading_hierarchy': 'h', 'semantic_elements': 'sem',
+}
+
+# Strings at least this long that occur more than once are written once and referenced as $n;
+# a literal $ in a value is written $$, so scraped text such as "$1" cannot pass for a reference
+_MIN_SHARED_LENGTH = 8
+
+
+def _escape(value: str) -> str:
+    return value.replace('$', '$$')
+
+
+def prompt_encoding(provider: str) -> str:
+    """Design-context encoding for a provider: PROMPT_ENCODING_<PROVIDER>, else PROMPT_ENCODING (default compact)."""
+    encoding = os.getenv(f"PROMPT_ENCODING_{provider.upper()}") or os.getenv("PROMPT_ENCODING", "compact")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Prompt encoding must be one of {ENCODINGS}, got {encoding!r}")
+    return encoding
+
+
+def _is_empty(value: Any) -> bool:
+    """True for missing, false, zero and the scraper's "unknown" placeholder."""
+    if isinstance(value, (dict, list, bool)):
+        return not value
+    if isinstance(value, (int, float)):
+        return value == 0
+    return value is None or value == '' or value == 'unknown'
+
+
+def _normalize(value: str) -> str:
+    return ' '.join(value.split()).lower()
+
+
+def _prune(value: Any) -> Any:
+    """Drop empty and false fields, turn flag maps into lists of set flags, and dedupe lists."""
+    if isinstance(value, dict):
+        if value and all(isinstance(v, bool) for v in value.values()):
+            return [key for key, flag in value.items() if flag]
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if not _is_empty(item)}
+    if isinstance(value, list):
+        seen = set()
+        items = []
+        for item in (_prune(item) for item in value):
+            marker = _normalize(item) if isinstance(item, str) else json.dumps(item, sort_keys=True)
+            if _is_empty(item) or marker in seen:
+                continue
+            seen.add(marker)
+            items.append(item.strip() if isinstance(item, str) else item)
+        return items
+    return value
+
+
+def _drop_categorized_colors(colors: Dict[str, Any]):
+    """all_colors repeats what primary/background/text already list; keep only the rest."""
+    listed = {_normalize(c) for key in ('primary', 'background', 'text') for c in colors.get(key, [])
+              if isinstance(c, str)}
+    rest = [c for c in colors.get('all_colors', []) if not isinstance(c, str) or _normalize(c) not in listed]
+    if rest:
+        colors['all_colors'] = rest
+    else:
+        colors.pop('all_colors', None)
+
+
+def _strings(value: Any) -> List[str]:
+    if isinstance(value, dict):
+        return [s for item in value.values() for s in _strings(item)]
+    if isinstance(value, list):
+        return [s for item in value for s in _strings(item)]
+    return [value] if isinstance(value, str) else []
+
+
+def _rewrite(value: Any, aliases: Dict[str, str], refs: Dict[str, str], used: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            short = aliases.get(key, key)
+            if short != key:
+                used[short] = key
+            out[short] = _rewrite(item, aliases, refs, used)
+        return out
+    if isinstance(value, list):
+        return [_rewrite(item, aliases, refs, used) for item in value]
+    if isinstance(value, str):
+        return refs.get(value) or _escape(value)
+    return value
+
+
+def compact_design_context(context: Dict[str, Any]) -> str:
+    """Token-lean rendering of a design context.
+
+    Empty and false fields are dropped, flag maps become lists of the set flags,
+    list values are deduplicated and keys are shortened. Long strings used more
+    than once are written once as $n, and a literal $ is written $$. The key
+    and value legends only cover what the encoded context actually uses.
+    """
+    pruned = _prune(context)
+    if isinstance(pruned.get('colors'), dict):
+        _drop_categorized_colors(pruned['colors'])
+        if not pruned['colors']:
+            del pruned['colors']
+
+    strings = _strings(pruned)
+    counts = Counter(strings)
+    shared = [s for s, n in counts.items() if n > 1 and len(s) >= _MIN_SHARED_LENGTH]
+    refs = {s: f"${index}" for index, s in enumerate(shared, 1)}
+    used: Dict[str, str] = {}
+    body = json.dumps(_rewrite(pruned, KEY_ALIASES, refs, used), separators=(',', ':'), ensure_ascii=False)
+
+    lines = []
+    if used:
+        legend = ', '.join(f"{short}={key}" for short, key in used.items())
+        lines.append(f"Keys: {legend}. Omitted fields are empty or false; flag groups list only the flags set.")
+    if refs:
+        lines.append("Values: " + '; '.join(f"{ref}={_escape(value)}" for value, ref in refs.items()))
+    if any('$' in value for value in strings):
+        lines.append("$$ stands for a literal $.")
+    lines.append(body)
+    return '\n'.join(lines)
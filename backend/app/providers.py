@@ -0,0 +1,393 @@
+import asyncio
+import html
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .instrumentation import current_metrics, percentile, record
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Delta = Optional[Callable[[int, str], None]]
+
+
+class LLMProvider:
+    """One backend able to complete chat-style messages."""
+
+    name = "base"
+
+    @property
+    def model(self) -> str:
+        raise NotImplementedError
+
+    async def complete(self, messages: List[Dict[str, Any]], max_tokens: int, on_delta: Delta = None,
+                       deadline: Optional[float] = None) -> str:
+        """Completion text; deadline is the event-loop time by which the call must finish."""
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI through an LLMGenerator's client, rate limiter and retries."""
+
+    name = "openai"
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    @property
+    def model(self) -> str:
+        return self.generator.model
+
+    async def complete(self, messages: List[Dict[str, Any]], max_tokens: int, on_delta: Delta = None,
+                       deadline: Optional[float] = None) -> str:
+        return await self.generator._request_openai_async(messages, max_tokens, on_delta, deadline=deadline)
+
+
+class AnthropicProvider(LLMProvider):
+    """Claude over the Messages API (see app/llm_generator.py)."""
+
+    name = "anthropic"
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.7):
+        self._model = model
+        self.temperature = temperature
+
+    @property
+    def model(self) -> str:
+        from .llm_generator import CLAUDE_MODEL
+        return self._model or CLAUDE_MODEL
+
+    async def complete(self, messages: List[Dict[str, Any]], max_tokens: int, on_delta: Delta = None,
+                       deadline: Optional[float] = None) -> str:
+        from .llm_generator import complete_messages
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - asyncio.get_running_loop().time()
+            # aiohttp reads a total timeout of 0 as no timeout at all
+            if timeout <= 0:
+                raise asyncio.TimeoutError("LLM deadline passed before the request was sent")
+        return await complete_messages(messages, max_tokens=max_tokens, temperature=self.temperature,
+                                       model=self.model, on_delta=on_delta, timeout=timeout)
+
+
+class CircuitBreaker:
+    """Opens after repeated failures, then lets one trial request through after a cooldown."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+        if now - self.opened_at < self.cooldown_seconds or self.trial_in_flight:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def failure(self, now: float):
+        self.consecutive_failures += 1
+        if self.trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = now
+        self.trial_in_flight = False
+
+
+class ProviderStats:
+    """Rolling latency and error rate of one provider."""
+
+    def __init__(self, window: int = 50):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def observe(self, seconds: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(seconds)
+
+    def latency(self, q: float = 0.5) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return percentile(sorted(self.latencies), q)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """Routes completions to the fastest healthy provider.
+
+    Providers are tried in order of recent median latency (untried ones first,
+    in configured order). Failures, including per-attempt timeouts, fail over
+    to the next provider and feed a per-provider circuit breaker, which also
+    opens while the rolling error rate exceeds ``max_error_rate``. When
+    every provider has failed or the overall deadline passes, the caller's
+    fallback (template generation) answers instead.
+
+    With ``hedge_quantile`` set, an attempt still running after that quantile
+    of the provider's recent latency is hedged: a duplicate request goes to the
+    next healthy provider (or the same one), the first complete response wins
+    and the other is cancelled. ``max_hedges_per_job`` bounds the extra calls.
+    """
+
+    def __init__(self, providers: List[LLMProvider], deadline_seconds: float = 180,
+                 attempt_timeout_seconds: float = 120, max_error_rate: float = 0.5, min_samples: int = 5,
+                 failure_threshold: int = 3, cooldown_seconds: float = 30, window: int = 50,
+                 hedge_quantile: Optional[float] = None, hedge_min_samples: int = 20,
+                 hedge_min_delay_seconds: float = 1.0, max_hedges_per_job: int = 2):
+        self.providers = providers
+        self.deadline_seconds = deadline_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.stats = {p.name: ProviderStats(window) for p in providers}
+        self.breakers = {p.name: CircuitBreaker(failure_threshold, cooldown_seconds) for p in providers}
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.max_hedges_per_job = max_hedges_per_job
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _check_error_rate(self, provider: LLMProvider, now: float):
+        """Trip the breaker of a provider whose rolling error rate is too high."""
+        stats = self.stats[provider.name]
+        if len(stats.outcomes) >= self.min_samples and stats.error_rate > self.max_error_rate:
+            logger.warning(f"LLM provider {provider.name} error rate {stats.error_rate:.0%}; opening circuit")
+            self.breakers[provider.name].opened_at = now
+            # Judge it afresh once the cooldown trial lets it back in
+            stats.outcomes.clear()
+
+    def ranked(self) -> List[LLMProvider]:
+        order = {p.name: index for index, p in enumerate(self.providers)}
+
+        def key(provider: LLMProvider):
+            latency = self.stats[provider.name].latency()
+            return (latency is not None, latency or 0.0, order[provider.name])
+
+        return sorted(self.providers, key=key)
+
+    async def complete(self, messages: List[Dict[str, Any]], max_tokens: int, on_delta: Delta = None,
+                       fallback: Optional[Callable[[], str]] = None) -> Tuple[str, str]:
+        """Completion text and the name of the provider that produced it ("template" for the fallback)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_seconds
+        last_error: Optional[BaseException] = None
+        for provider in self.ranked():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._check_error_rate(provider, time.monotonic())
+            if not self.breakers[provider.name].allow(time.monotonic()):
+                continue
+            try:
+                text, name = await self._attempt(provider, messages, max_tokens, on_delta,
+                                                 min(remaining, self.attempt_timeout_seconds))
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM provider {provider.name} failed ({type(e).__name__}: {e}); trying next")
+                continue
+            return text, name
+
+        if fallback is not None:
+            self.fallbacks += 1
+            record(llm_fallbacks=1)
+            logger.warning("No LLM provider answered in time; using template fallback")
+            return fallback(), "template"
+        raise last_error or RuntimeError("No healthy LLM provider available")
+
+    async def _run(self, provider: LLMProvider, messages: List[Dict[str, Any]], max_tokens: int,
+                   on_delta: Delta, timeout: float) -> str:
+        """One call to provider, feeding its latency stats and circuit breaker."""
+        loop = asyncio.get_running_loop()
+        breaker = self.breakers[provider.name]
+        started = loop.time()
+        try:
+            text = await asyncio.wait_for(provider.complete(messages, max_tokens, on_delta, deadline=started + timeout),
+                                          timeout)
+        except asyncio.CancelledError:
+            # Cancelled as the losing side of a hedge (or with the job): not the provider's fault
+            breaker.trial_in_flight = False
+            raise
+        except Exception:
+            self.stats[provider.name].observe(loop.time() - started, ok=False)
+            breaker.failure(time.monotonic())
+            raise
+        self.stats[provider.name].observe(loop.time() - started, ok=True)
+        breaker.success()
+        return text
+
+    def _hedge_delay(self, provider: LLMProvider) -> Optional[float]:
+        """Seconds to wait before hedging a call to provider, or None when it should not be hedged."""
+        if not self.hedge_quantile:
+            return None
+        stats = self.stats[provider.name]
+        if len(stats.latencies) < self.hedge_min_samples:
+            return None
+        metrics = current_metrics()
+        if metrics is not None and metrics.counters.get("llm_hedges", 0) >= self.max_hedges_per_job:
+            return None
+        return max(stats.latency(self.hedge_quantile), self.hedge_min_delay_seconds)
+
+    def _hedge_target(self, provider: LLMProvider) -> LLMProvider:
+        """Next healthy provider by latency, else provider itself."""
+        now = time.monotonic()
+        for other in self.ranked():
+            if other is not provider and self.breakers[other.name].allow(now):
+                return other
+        return provider
+
+    async def _attempt(self, provider: LLMProvider, messages: List[Dict[str, Any]], max_tokens: int,
+                       on_delta: Delta, timeout: float) -> Tuple[str, str]:
+        """Call provider, hedging the call once it outlasts the hedge delay."""
+        delay = self._hedge_delay(provider)
+        if delay is None or delay >= timeout:
+            return await self._run(provider, messages, max_tokens, on_delta, timeout), provider.name
+
+        primary = asyncio.create_task(self._run(provider, messages, max_tokens, on_delta, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result(), provider.name
+        # The metrics check in _hedge_delay ran before the wait; concurrent calls may have used up the cap since
+        metrics = current_metrics()
+        if metrics is not None and metrics.counters.get("llm_hedges", 0) >= self.max_hedges_per_job:
+            return await primary, provider.name
+
+        hedge_provider = self._hedge_target(provider)
+        self.hedges += 1
+        record(llm_hedges=1)
+        logger.info(f"LLM provider {provider.name} slower than {delay:.2f}s; hedging with {hedge_provider.name}")
+        # Only the primary streams; a winning hedge replaces the partial output in one delta
+        hedge = asyncio.create_task(self._run(hedge_provider, messages, max_tokens, None, timeout - delay))
+        owners = {primary: provider, hedge: hedge_provider}
+        pending = set(owners)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self.hedge_wins += 1
+                        if on_delta is not None:
+                            on_delta(0, task.result())
+                    return task.result(), owners[task].name
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "providers": {
+                p.name: {
+                    "p50_seconds": self.stats[p.name].latency(0.5),
+                    "p95_seconds": self.stats[p.name].latency(0.95),
+                    "error_rate": round(self.stats[p.name].error_rate, 4),
+                    "samples": len(self.stats[p.name].outcomes),
+                    "circuit_open": self.breakers[p.name].is_open,
+                }
+                for p in self.providers
+            },
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def create_provider_router(openai_generator) -> ProviderRouter:
+    """Build the router over the providers listed in LLM_PROVIDERS (default: openai, plus anthropic when keyed)."""
+    default = "openai,anthropic" if os.getenv("ANTHROPIC_API_KEY") else "openai"
+    available = {
+        "openai": lambda: OpenAIProvider(openai_generator),
+        "anthropic": lambda: AnthropicProvider(model=os.getenv("ANTHROPIC_MODEL") or None),
+    }
+    providers = []
+    for name in os.getenv("LLM_PROVIDERS", default).split(","):
+        name = name.strip()
+        if name not in available:
+            raise ValueError(f"Unknown LLM provider {name!r}; expected one of {sorted(available)}")
+        providers.append(available[name]())
+    return ProviderRouter(providers, **router_options())
+
+
+def router_options() -> Dict[str, Any]:
+    """ProviderRouter deadlines, circuit breaker and hedging settings from environment variables."""
+    return {
+        "deadline_seconds": float(os.getenv("LLM_ROUTER_DEADLINE_SECONDS", "180")),
+        "attempt_timeout_seconds": float(os.getenv("LLM_PROVIDER_TIMEOUT_SECONDS", "120")),
+        "max_error_rate": float(os.getenv("LLM_PROVIDER_MAX_ERROR_RATE", "0.5")),
+        "failure_threshold": int(os.getenv("LLM_CIRCUIT_FAILURES", "3")),
+        "cooldown_seconds": float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", "30")),
+        "hedge_quantile": float(os.getenv("LLM_HEDGE_QUANTILE") or 0) or None,
+        "hedge_min_samples": int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        "hedge_min_delay_seconds": float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1")),
+        "max_hedges_per_job": int(os.getenv("LLM_MAX_HEDGES_PER_JOB", "2")),
+    }
+
+
+def template_artifact(name: str, scraped_data: Dict[str, Any]) -> str:
+    """Deterministic html/css/javascript built straight from the scraped data, used when no LLM answers."""
+    metadata = scraped_data.get("metadata", {})
+    layout = scraped_data.get("layout", {})
+    if name == "html":
+        def text(section: str) -> str:
+            return html.escape((layout.get(section) or {}).get("content", ""))[:2000]
+        links = "".join(
+            f'<li><a href="{html.escape(item.get("href", ""), quote=True)}">{html.escape(item.get("text", ""))}</a></li>'
+            for item in layout.get("navigation") or []
+        )
+        return (
+            "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+            "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">\n"
+            f"<title>{html.escape(metadata.get('title', ''))}</title>\n"
+            f"<meta name=\"description\" content=\"{html.escape(metadata.get('description', ''), quote=True)}\">\n"
+            "<link rel=\"stylesheet\" href=\"styles.css\">\n</head>\n<body>\n"
+            f"<header><p>{text('header')}</p><nav><button class=\"menu-toggle\" aria-label=\"Menu\">&#9776;</button>"
+            f"<ul class=\"menu\">{links}</ul></nav></header>\n"
+            f"<main><p>{text('main')}</p></main>\n<footer><p>{text('footer')}</p></footer>\n"
+            "<script src=\"script.js\"></script>\n</body>\n</html>\n"
+        )
+    if name == "css":
+        colors = metadata.get("color_scheme") or ["#222222", "#ffffff"]
+        fonts = metadata.get("fonts") or ["system-ui"]
+        background = colors[1] if len(colors) > 1 else "#ffffff"
+        return (
+            "*{box-sizing:border-box;margin:0;padding:0}\n"
+            f"body{{font-family:{fonts[0]},sans-serif;color:{colors[0]};background:{background};line-height:1.6}}\n"
+            "header,main,footer{max-width:1100px;margin:0 auto;padding:1.5rem}\n"
+            "nav ul{display:flex;gap:1rem;list-style:none}\n.menu-toggle{display:none}\n"
+            "@media (max-width:700px){.menu-toggle{display:block}nav ul{display:none;flex-direction:column}"
+            "nav ul.open{display:flex}}\n"
+        )
+    return (
+        "document.querySelector('.menu-toggle')?.addEventListener('click', () => {\n"
+        "  document.querySelector('.menu')?.classList.toggle('open');\n});\n"
+        "document.querySelectorAll('a[href^=\"#\"]').forEach((link) => {\n"
+        "  link.addEventListener('click', (event) => {\n"
+        "    const target = document.querySelector(link.getAttribute('href'));\n"
+        "    if (target) { event.preventDefault(); target.scrollIntoView({ behavior: 'smooth' }); }\n"
+        "  });\n});\n"
+    )
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Mapping, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse provider reset durations such as ``"20ms"``, ``"1s"`` or ``"6m0s"``, or plain seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``capacity`` per minute.
+
+    ``reserve`` always takes the tokens and may drive the balance negative; the
+    returned wait is how long the caller must pause for the debt to be repaid.
+    With headroom the wait is zero, so callers never sleep needlessly.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def clamp(self, remaining: float, now: float):
+        """Align the local balance with the provider's reported remaining quota."""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """Process-wide limiter for outbound LLM requests.
+
+    Tracks requests/min and tokens/min with token buckets, syncs them with the
+    provider's ``x-ratelimit-*`` headers, and honors ``Retry-After`` by pausing
+    all callers. Concurrency adapts AIMD-style: every success raises the limit
+    by ``1/limit`` and every rate-limit response halves it.
+    """
+
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = 40000,
+                 max_concurrency: int = 8, min_concurrency: int = 1):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(estimated_tokens, now),
+                self.blocked_until - now,
+            )
+            wait = max(wait, 0.0)
+            self.waited_seconds += wait
+            return wait
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """Wait for a concurrency slot and request/token budget, then hold the slot."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.concurrency_limit))
+            self.in_flight += 1
+        try:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def acquire_sync(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """Blocking variant for the synchronous client; applies budgets but not the concurrency limit."""
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+        yield
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Return over-reserved tokens (or charge the shortfall) once real usage is known."""
+        with self._lock:
+            now = time.monotonic()
+            if actual_tokens < estimated_tokens:
+                self.tokens.refund(estimated_tokens - actual_tokens, now)
+            elif actual_tokens > estimated_tokens:
+                self.tokens.reserve(actual_tokens - estimated_tokens, now)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Sync budgets with the provider's rate-limit headers."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                if remaining > 0:
+                    bucket.clamp(remaining, now)
+                else:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or 1.0
+                    self.blocked_until = max(self.blocked_until, now + reset)
+
+    def on_success(self):
+        with self._lock:
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        self._notify()
+
+    def on_rate_limited(self, headers: Optional[Mapping[str, str]] = None):
+        """Back off after a 429: halve concurrency and pause everyone until Retry-After."""
+        retry_after = None
+        if headers is not None:
+            retry_after_ms = headers.get("retry-after-ms")
+            if retry_after_ms:
+                retry_after = parse_duration(retry_after_ms + "ms")
+            if retry_after is None:
+                retry_after = parse_duration(headers.get("retry-after"))
+        with self._lock:
+            self.rate_limited += 1
+            self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + (retry_after or 1.0))
+        if headers is not None:
+            self.update_from_headers(headers)
+        logger.warning(f"LLM rate limited; concurrency limit now {int(self.concurrency_limit)}, "
+                       f"pausing {retry_after or 1.0:.1f}s")
+
+    def _notify(self):
+        condition = self._condition
+        if condition is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        async def notify():
+            async with condition:
+                condition.notify_all()
+
+        loop.create_task(notify())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "concurrency_limit": int(self.concurrency_limit),
+            "in_flight": self.in_flight,
+            "rate_limited": self.rate_limited,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
+
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """Rough prompt + completion token estimate (about four characters per token)."""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every LLM client, configured through environment variables."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "40000")),
+            max_concurrency=int(os.getenv("LLM_MAX_INFLIGHT_REQUESTS", "8")),
+            min_concurrency=int(os.getenv("LLM_MIN_INFLIGHT_REQUESTS", "1")),
+        )
+    return _limiter
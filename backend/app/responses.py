@@ -0,0 +1,82 @@
+import hashlib
+import math
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def compute_etag(content: str) -> str:
+    """Strong ETag for a text artifact."""
+    return '"' + hashlib.sha256(content.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of the representation sent with ``encoding``.
+
+    Each content coding is a different byte sequence, so it gets its own strong
+    validator: the coding is appended inside the quotes (``"<hash>-gzip"``).
+    """
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the given ETag."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def encode_chunks(chunks: Iterable[str], encoding: Optional[str]) -> Iterator[bytes]:
+    """Incrementally encode and compress text chunks for a streaming response."""
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            data = compressor.process(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.finish()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+    else:
+        for chunk in chunks:
+            yield chunk.encode("utf-8")
+
+
+def poll_retry_after(eta_seconds: Optional[float], minimum: int = 1, maximum: int = 30) -> int:
+    """Suggested seconds before the next status poll, scaled to the remaining time."""
+    if eta_seconds is None:
+        return 2
+    return int(min(max(math.ceil(eta_seconds / 4), minimum), maximum))
@@ -0,0 +1,78 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from .cache import TieredCache, hash_key
+from .coalescing import normalize_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def design_fingerprint(scraped_data: Dict[str, Any]) -> str:
+    """Hash of the scraped design data that drives generation.
+
+    Each layout section's raw ``html`` is left out. Nonces, CSRF tokens,
+    timestamps and ad markup change it on every fetch, while the text,
+    headings, links, id and classes the prompts use are hashed on their own.
+    """
+    layout = {
+        name: {key: value for key, value in section.items() if key != "html"} if isinstance(section, dict) else section
+        for name, section in (scraped_data.get("layout") or {}).items()
+    }
+    return hash_key(
+        scraped_data.get("metadata", {}),
+        layout,
+        scraped_data.get("styles", {}),
+    )
+
+
+class ResultCache:
+    """Content-addressed cache of generated code for completed clones.
+
+    Entries are keyed by normalized URL plus a fingerprint of the scraped design
+    data, so an unchanged site skips LLM generation entirely. A URL-only index
+    remembers the latest fingerprint for ``fresh_seconds`` so that a repeat
+    request inside that window can skip the scrape as well. That serves the
+    site as it was when last scraped, so it is off unless ``fresh_seconds`` is set.
+    """
+
+    def __init__(self, results: TieredCache, fresh_seconds: float = 0):
+        self.results = results
+        self.fresh_seconds = fresh_seconds
+        self.latest = TieredCache("latest-fingerprint", max_entries=results.max_entries,
+                                  ttl_seconds=fresh_seconds) if fresh_seconds else None
+
+    def get_recent(self, url: str) -> Optional[Dict[str, str]]:
+        """Cached code for a URL scraped within the fresh window, without scraping again."""
+        if self.latest is None:
+            return None
+        fingerprint = self.latest.get(hash_key(normalize_url(url)))
+        if fingerprint is None:
+            return None
+        return self.get(url, fingerprint)
+
+    def get(self, url: str, fingerprint: str) -> Optional[Dict[str, str]]:
+        return self.results.get(hash_key(normalize_url(url), fingerprint))
+
+    def put(self, url: str, fingerprint: str, code: Dict[str, str]):
+        normalized = normalize_url(url)
+        self.results.put(hash_key(normalized, fingerprint), code)
+        if self.latest is not None:
+            self.latest.put(hash_key(normalized), fingerprint)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.results.stats()
+
+
+def create_result_cache() -> ResultCache:
+    """Build the result cache configured through environment variables."""
+    results = TieredCache(
+        "result",
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")),
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600))) or None,
+        disk_dir=os.getenv("RESULT_CACHE_DIR", "data/result_cache") or None,
+        max_disk_bytes=int(os.getenv("RESULT_CACHE_MAX_DISK_BYTES", str(512 * 1024 * 1024))),
+    )
+    return ResultCache(results, fresh_seconds=float(os.getenv("RESULT_CACHE_FRESH_SECONDS", "0")))
@@ -1,63 +1,183 @@
+import asyncio
+import aiohttp
+import multiprocessing
+import os
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import logging
+import time
 from urllib.parse import urlparse, urljoin
+from .instrumentation import stage, record, record_stage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PARSE_MODES = ('inline', 'thread', 'process')
+
+# Markup kept per layout section in process mode; the prompt budgets never use more than this
+SECTION_HTML_MAX_CHARS = int(os.getenv('SCRAPER_SECTION_HTML_CHARS', '12000'))
+
+def extract_design_data(raw: bytes, url: str, encoding: str) -> Tuple[Dict, Dict[str, float]]:
+    """
+    Process-pool entry point: parse raw page bytes and return only the compact
+    extracted design data plus stage timings. Neither the raw HTML nor more section
+    markup than a prompt can use is sent back across the process boundary.
+    """
+    html = raw.decode(encoding, errors='replace')
+    timings: Dict[str, float] = {}
+    data = WebScraper()._extract(html, url, include_raw_html=False, timings=timings)
+    for name in ('header', 'main', 'footer'):
+        section = data['layout'][name]
+        if 'html' in section:
+            section['html'] = section['html'][:SECTION_HTML_MAX_CHARS]
+    return data, timings
+
 class WebScraper:
-    def __init__(self):
+    def __init__(self, parse_mode: Optional[str] = None, parse_workers: Optional[int] = None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.timeout = 10
+        self._session: Optional[aiohttp.ClientSession] = None
+        # How scrape_website_async parses pages: on the loop, in a thread, or in a process pool
+        self.parse_mode = (parse_mode or os.getenv('SCRAPER_PARSE_MODE', 'thread')).lower()
+        if self.parse_mode not in PARSE_MODES:
+            raise ValueError(f"Unknown SCRAPER_PARSE_MODE: {self.parse_mode}")
+        self.parse_workers = parse_workers or int(os.getenv('SCRAPER_PARSE_WORKERS', str(os.cpu_count() or 2)))
+        self._executor: Optional[ProcessPoolExecutor] = None
 
     def scrape_website(self, url: str) -> Dict:
         """
         Scrape a website and return its structure and content.
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = requests.get(url, headers=self.headers, timeout=self.timeout)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract basic metadata
-            metadata = {
-                'title': self._get_title(soup),
-                'description': self._get_description(soup),
-                'favicon': self._get_favicon(soup, url),
-                'color_scheme': self._extract_color_scheme(soup),
-                'fonts': self._extract_fonts(soup),
-            }
-            
-            # Extract layout structure
-            layout = {
-                'header': self._extract_section(soup, 'header'),
-                'main': self._extract_section(soup, 'main'),
-                'footer': self._extract_section(soup, 'footer'),
-                'navigation': self._extract_navigation(soup),
-            }
-            
-            # Extract styles
-            styles = {
-                'css': self._extract_css(soup),
-                'inline_styles': self._extract_inline_styles(soup),
-            }
-            
-            return {
-                'url': url,
-                'metadata': metadata,
-                'layout': layout,
-                'styles': styles,
-                'raw_html': response.text
-            }
-            
+            return self._extract(response.text, url)
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            raise
+
+    async def scrape_website_async(self, url: str) -> Dict:
+        """
+        Async variant of scrape_website that fetches over a shared aiohttp session.
+        """
+        try:
+            session = self._get_session()
+            with stage('fetch'):
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    raw = await response.read()
+                    encoding = response.charset or 'utf-8'
+            record(bytes_downloaded=len(raw))
+            return await self._parse(raw, url, encoding)
         except Exception as e:
             logger.error(f"Error scraping {url}: {str(e)}")
             raise
 
+    async def _parse(self, raw: bytes, url: str, encoding: str) -> Dict:
+        """Parse fetched bytes according to parse_mode; parsing is CPU-bound and holds the GIL."""
+        timings: Dict[str, float] = {}
+        if self.parse_mode == 'inline':
+            data = self._extract(raw.decode(encoding, errors='replace'), url, timings=timings)
+        elif self.parse_mode == 'thread':
+            data = await asyncio.to_thread(self._extract, raw.decode(encoding, errors='replace'), url, True, timings)
+        else:
+            loop = asyncio.get_running_loop()
+            # No prompt uses raw_html, so the page is not decoded a second time here
+            data, timings = await loop.run_in_executor(self._get_executor(), extract_design_data, raw, url, encoding)
+        for name, seconds in timings.items():
+            record_stage(name, seconds)
+        return data
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs an event loop and holds open sockets is unsafe;
+            # forkserver (spawn where unavailable) starts workers from a clean interpreter
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            logger.info(f"Started parse process pool with {self.parse_workers} workers")
+        return self._executor
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the aiohttp session on the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    def pool_stats(self) -> Dict[str, Optional[int]]:
+        """Connections currently in use and the pool limit of the shared session.
+
+        in_use comes from a private aiohttp attribute and is None when that is unavailable.
+        """
+        if self._session is None or self._session.closed:
+            return {'in_use': 0, 'limit': 0}
+        connector = self._session.connector
+        try:
+            in_use = len(connector._acquired)
+        except (AttributeError, TypeError):
+            in_use = None
+        return {'in_use': in_use, 'limit': connector.limit}
+
+    async def close(self):
+        """Close the shared aiohttp session and the parse process pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _extract(self, html: str, url: str, include_raw_html: bool = True,
+                 timings: Optional[Dict[str, float]] = None) -> Dict:
+        """Parse raw HTML and extract the design data used for generation.
+        Parse and extraction durations are written to timings when given."""
+        started = time.perf_counter()
+        soup = BeautifulSoup(html, 'html.parser')
+        parsed = time.perf_counter()
+
+        # Extract basic metadata
+        metadata = {
+            'title': self._get_title(soup),
+            'description': self._get_description(soup),
+            'favicon': self._get_favicon(soup, url),
+            'color_scheme': self._extract_color_scheme(soup),
+            'fonts': self._extract_fonts(soup),
+        }
+        
+        # Extract layout structure
+        layout = {
+            'header': self._extract_section(soup, 'header'),
+            'main': self._extract_section(soup, 'main'),
+            'footer': self._extract_section(soup, 'footer'),
+            'navigation': self._extract_navigation(soup),
+        }
+        
+        # Extract styles
+        styles = {
+            'css': self._extract_css(soup),
+            'inline_styles': self._extract_inline_styles(soup),
+        }
+        
+        data = {
+            'url': url,
+            'metadata': metadata,
+            'layout': layout,
+            'styles': styles,
+        }
+        if include_raw_html:
+            data['raw_html'] = html
+        if timings is not None:
+            timings['parse'] = parsed - started
+            timings['extract'] = time.perf_counter() - parsed
+        return data
+
     def _get_title(self, soup: BeautifulSoup) -> str:
         """Extract the page title."""
         title_tag = soup.find('title')
@@ -123,6 +243,9 @@ class WebScraper:
             
         return {
             'content': section_elem.get_text(strip=True),
+            'headings': [h.get_text(' ', strip=True) for h in section_elem.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])],
+            'links': [{'text': a.get_text(' ', strip=True), 'href': a.get('href', '')}
+                      for a in section_elem.find_all('a')],
             'html': str(section_elem),
             'classes': section_elem.get('class', []),
             'id': section_elem.get('id', '')
@@ -0,0 +1,45 @@
+"""Compare prompt sizes of the design-context encodings on the fixture corpus.
+
+Run from backend/:  python -m benchmarks.prompt_encoding
+
+Tokens are counted with tiktoken's cl100k_base when it is installed, otherwise
+estimated at four characters per token. Claude's tokenizer differs, but the
+relative savings carry over.
+"""
+import json
+import sys
+from pathlib import Path
+
+from app.llm_generator import CACHE_MIN_TOKENS, CLONE_INSTRUCTIONS, _create_prompt
+from app.prompt_budget import count_tokens, tiktoken
+from app.prompt_encoding import ENCODINGS
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def main() -> int:
+    paths = sorted(FIXTURES.glob("*.json"))
+    if not paths:
+        print(f"No fixtures in {FIXTURES}")
+        return 1
+
+    print(f"Token counts ({'tiktoken' if tiktoken else 'estimated'}), per-site prompt only")
+    print(f"{'fixture':<24}" + "".join(f"{encoding:>10}" for encoding in ENCODINGS) + f"{'saved':>10}")
+    totals = dict.fromkeys(ENCODINGS, 0)
+    for path in paths:
+        scrape_data = json.loads(path.read_text())
+        tokens = {encoding: count_tokens(_create_prompt(scrape_data, encoding)) for encoding in ENCODINGS}
+        for encoding, count in tokens.items():
+            totals[encoding] += count
+        saved = 1 - tokens["compact"] / tokens["json"]
+        print(f"{path.stem:<24}" + "".join(f"{tokens[e]:>10}" for e in ENCODINGS) + f"{saved:>10.1%}")
+
+    saved = 1 - totals["compact"] / totals["json"]
+    print(f"{'total':<24}" + "".join(f"{totals[e]:>10}" for e in ENCODINGS) + f"{saved:>10.1%}")
+    print(f"Static prefix (CLONE_INSTRUCTIONS): {count_tokens(CLONE_INSTRUCTIONS)} tokens "
+          f"(prompt-cached from {CACHE_MIN_TOKENS})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,183 @@
 import os
+import sys
 import json
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List
 import asyncio
 from datetime import datetime
 import anthropic
+import httpx
 from anthropic import AsyncAnthropic
 
+# This file sits beside the app package rather than in it, so make backend/ importable
+# wherever it is run or loaded from
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+if _BACKEND_DIR not in sys.path:
+    sys.path.insert(0, _BACKEND_DIR)
+
+from app.completion_cache import completion_key, get_completion_cache
+from app.instrumentation import record
+from app.llm_generator import system_blocks
+from app.providers import LLMProvider, ProviderRouter, router_options
+
+# Static prompt prefix, identical for every site. It is sent as the system prompt and marked for
+# provider-side prompt caching, so repeat clones only pay full price for the per-site suffix.
+SYSTEM_PROMPT = """You are an expert web developer and designer specializing in creating pixel-perfect HTML clones of websites. Your task is to generate a complete, single-file HTML document that closely matches the original website's aesthetics based on the provided design context.
+
+Your approach should be:
+1. Analyze the design context thoroughly
+2. Identify the key visual elements and patterns
+3. Create semantic HTML structure
+4. Write comprehensive CSS that matches the original design
+5. Add interactive JavaScript for enhanced user experience
+6. Ensure full responsiveness across all devices
+7. Optimize for performance and accessibility
+
+Always output a complete, valid HTML5 document with all CSS and JavaScript inline."""
+
+CLONE_INSTRUCTIONS = """CRITICAL REQUIREMENTS:
+1. Match the visual design as closely as possible
+2. Use the exact color palette detected
+3. Implement the same layout structure
+4. Include all detected components
+5. Ensure full responsiveness
+6. Add smooth animations and transitions
+
+Generate a complete HTML document that:
+1. Uses semantic HTML5 elements
+2. Includes all CSS in a <style> tag
+3. Implements the exact color scheme
+4. Matches the typography hierarchy
+5. Recreates the layout structure
+6. Includes smooth hover effects and transitions
+7. Is fully responsive with appropriate breakpoints
+8. Includes interactive JavaScript for navigation and UI elements
+9. Has proper meta tags for SEO
+10. Follows accessibility best practices
+
+The HTML should be production-ready and visually identical to the original site. The design context of the site to clone follows in the user message."""
+
+STATIC_PREFIX = f"{SYSTEM_PROMPT}\n\n{CLONE_INSTRUCTIONS}"
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client for AsyncAnthropic, multiplexed over HTTP/2 when h2 is installed"""
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv('ANTHROPIC_MAX_CONNECTIONS', '20')),
+            max_keepalive_connections=int(os.getenv('ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS', '10')),
+            keepalive_expiry=float(os.getenv('ANTHROPIC_KEEPALIVE_SECONDS', '60'))
+        ),
+        timeout=httpx.Timeout(float(os.getenv('ANTHROPIC_TIMEOUT_SECONDS', '300')), connect=10.0)
+    )
+
+class AsyncAnthropicProvider(LLMProvider):
+    """Claude through an AsyncAnthropic client, so the SDK path gets the provider router's breaker and hedging"""
+    
+    name = "anthropic"
+    
+    def __init__(self, client: AsyncAnthropic, model: str, temperature: float = 0.3):
+        self.client = client
+        self._model = model
+        self.temperature = temperature
+    
+    @property
+    def model(self) -> str:
+        return self._model
+    
+    async def complete(self, messages: List[Dict[str, Any]], max_tokens: int,
+                       on_delta: Optional[Callable[[int, str], None]] = None,
+                       deadline: Optional[float] = None) -> str:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        options = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": self.temperature,
+            # Once it is long enough, the static prefix is a cache breakpoint: later requests read it
+            # from the provider's prompt cache
+            "system": system_blocks(system),
+            "messages": [m for m in messages if m["role"] != "system"]
+        }
+        if deadline is not None:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                raise asyncio.TimeoutError("LLM deadline passed before the request was sent")
+            options["timeout"] = timeout
+        
+        if on_delta is not None:
+            # Stream so callers can show the document while it is being written
+            pieces = []
+            offset = 0
+            async with self.client.messages.stream(**options) as stream:
+                async for text in stream.text_stream:
+                    on_delta(offset, text)
+                    pieces.append(text)
+                    offset += len(text)
+                response = await stream.get_final_message()
+            text = "".join(pieces)
+        else:
+            response = await self.client.messages.create(**options)
+            text = response.content[0].text
+        self._record_usage(response.usage)
+        return text
+    
+    def _record_usage(self, usage):
+        """Add token usage, including prompt cache reads and writes, to the current job's metrics"""
+        record(
+            llm_calls=1,
+            prompt_tokens=usage.input_tokens or 0,
+            completion_tokens=usage.output_tokens or 0,
+            prompt_cache_read_tokens=getattr(usage, 'cache_read_input_tokens', None) or 0,
+            prompt_cache_write_tokens=getattr(usage, 'cache_creation_input_tokens', None) or 0
+        )
+
 class EnhancedLLMGenerator:
     """Enhanced LLM integration with Claude API for generating HTML clones"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY', '')
         self.use_claude_api = bool(self.api_key)
         
         if self.use_claude_api:
-            self.client = AsyncAnthropic(api_key=self.api_key)
+            self.http_client = http_client or create_http_client()
+            # ANTHROPIC_BASE_URL points the client at a proxy or a local stub server
+            self.client = AsyncAnthropic(api_key=self.api_key, base_url=os.getenv('ANTHROPIC_BASE_URL') or None,
+                                         http_client=self.http_client)
             self.model = "claude-3-5-sonnet-20241022"  # Latest Claude model
+            # Circuit breaker, hedging and template fallback shared with the app's LLM calls (LLM_* settings)
+            self.router = ProviderRouter([AsyncAnthropicProvider(self.client, self.model)], **router_options())
         else:
             print("No Anthropic API key found. Using template-based generation.")
     
-    async def generate_html(self, design_context: Dict[str, Any]) -> str:
-        """Generate HTML based on scraped design context"""
+    async def warm_up(self):
+        """Open a connection to the Claude API ahead of the first request"""
+        if not self.use_claude_api:
+            return
+        try:
+            await self.http_client.head(str(self.client.base_url),
+                                        timeout=float(os.getenv('ANTHROPIC_WARMUP_TIMEOUT_SECONDS', '5')))
+        except httpx.HTTPError as e:
+            print(f"Claude API warm-up failed: {e}")
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self.use_claude_api:
+            await self.client.close()
+    
+    async def generate_html(self, design_context: Dict[str, Any],
+                            on_delta: Optional[Callable[[int, str], None]] = None,
+                            use_cache: bool = True) -> str:
+        """Generate HTML based on scraped design context; on_delta(offset, text) receives streamed text"""
         
         if self.use_claude_api:
             try:
                 # Use Claude API for generation
-                return await self._generate_with_claude(design_context)
+                return await self._generate_with_claude(design_context, on_delta, use_cache)
             except Exception as e:
                 print(f"Claude API error: {e}. Falling back to template generation.")
                 return await self._generate_with_advanced_template(design_context)
@@ -33,23 +185,11 @@ class EnhancedLLMGenerator:
             # Use advanced template generation
             return await self._generate_with_advanced_template(design_context)
     
-    async def _generate_with_claude(self, context: Dict[str, Any]) -> str:
+    async def _generate_with_claude(self, context: Dict[str, Any],
+                                    on_delta: Optional[Callable[[int, str], None]] = None,
+                                    use_cache: bool = True) -> str:
         """Generate HTML using Claude API with advanced prompting"""
         
-        # Create a comprehensive prompt with chain-of-thought reasoning
-        system_prompt = """You are an expert web developer and designer specializing in creating pixel-perfect HTML clones of websites. Your task is to generate a complete, single-file HTML document that closely matches the original website's aesthetics based on the provided design context.
-
-Your approach should be:
-1. Analyze the design context thoroughly
-2. Identify the key visual elements and patterns
-3. Create semantic HTML structure
-4. Write comprehensive CSS that matches the original design
-5. Add interactive JavaScript for enhanced user experience
-6. Ensure full responsiveness across all devices
-7. Optimize for performance and accessibility
-
-Always output a complete, valid HTML5 document with all CSS and JavaScript inline."""
-
         # Create structured prompt with design context
         user_prompt = self._create_structured_prompt(context)
         
@@ -80,23 +220,35 @@ Always output a complete, valid HTML5 document with all CSS and JavaScript inlin
                     *screenshot_content
                 ]
         
-        # Call Claude API
-        response = await self.client.messages.create(
-            model=self.model,
-            max_tokens=8000,
-            temperature=0.3,  # Lower temperature for more consistent output
-            system=system_prompt,
-            messages=messages
+        messages.insert(0, {"role": "system", "content": STATIC_PREFIX})
+        
+        # Identical prompts reuse an earlier completion, keyed by provider and model like the app's router path
+        cache = get_completion_cache()
+        key = completion_key(f"anthropic/{self.model}", messages, 0.3, 8000)
+        cached = cache.get(key) if use_cache else None
+        if cached is not None:
+            record(llm_cache_hits=1)
+            if on_delta is not None:
+                on_delta(0, cached)
+            return self._post_process_html(cached)
+        
+        # The router feeds its circuit breaker, hedges slow calls when configured, and builds the
+        # template page when Claude does not answer before the deadline
+        html_content, source = await self.router.complete(
+            messages, 8000, on_delta=on_delta, fallback=lambda: self._build_advanced_template(context)
         )
-        
-        # Extract HTML from response
-        html_content = response.content[0].text
+        if source == "template":
+            # Not cached, so the next request tries Claude again
+            if on_delta is not None:
+                on_delta(0, html_content)
+            return html_content
+        cache.put(key, html_content)
         
         # Post-process to ensure valid HTML
         return self._post_process_html(html_content)
     
     def _create_structured_prompt(self, context: Dict[str, Any]) -> str:
-        """Create a detailed, structured prompt for Claude"""
+        """Create the per-site part of the prompt; the shared instructions live in STATIC_PREFIX"""
         
         # Build component list
         detected_components = []
@@ -122,14 +274,6 @@ Primary Colors:
         
         prompt = f"""Create an HTML clone of the website: {context['url']}
 
-CRITICAL REQUIREMENTS:
-1. Match the visual design as closely as possible
-2. Use the exact color palette detected
-3. Implement the same layout structure
-4. Include all detected components
-5. Ensure full responsiveness
-6. Add smooth animations and transitions
-
 DESIGN CONTEXT:
 
 **Basic Information:**
@@ -171,21 +315,7 @@ DESIGN CONTEXT:
 - Mobile Menu: {context['responsive']['has_mobile_menu']}
 
 **Typography Details:**
-{json.dumps(context['typography'].get('headings', {}), indent=2)}
-
-Generate a complete HTML document that:
-1. Uses semantic HTML5 elements
-2. Includes all CSS in a <style> tag
-3. Implements the exact color scheme
-4. Matches the typography hierarchy
-5. Recreates the layout structure
-6. Includes smooth hover effects and transitions
-7. Is fully responsive with appropriate breakpoints
-8. Includes interactive JavaScript for navigation and UI elements
-9. Has proper meta tags for SEO
-10. Follows accessibility best practices
-
-The HTML should be production-ready and visually identical to the original site."""
+{json.dumps(context['typography'].get('headings', {}), indent=2)}"""
         
         return prompt
     
@@ -195,6 +325,11 @@ The HTML should be production-ready and visually identical to the original site.
         # Simulate processing
         await asyncio.sleep(0.5)
         
+        return self._build_advanced_template(context)
+    
+    def _build_advanced_template(self, context: Dict[str, Any]) -> str:
+        """Template page built straight from the design context; also the router's fallback"""
+        
         # Extract design elements with better defaults
         colors = self._extract_color_scheme(context['colors'])
         typography = self._extract_typography(context['typography'])
@@ -1407,7 +1542,29 @@ The HTML should be production-ready and visually identical to the original site.
         return html.strip()
 
 # Convenience function for the main app
-async def generate_html_clone(design_context: Dict[str, Any]) -> str:
+async def generate_html_clone(design_context: Dict[str, Any],
+                              on_delta: Optional[Callable[[int, str], None]] = None,
+                              use_cache: bool = True) -> str:
     """Generate HTML clone using enhanced LLM"""
-    generator = EnhancedLLMGenerator()
-    return await generator.generate_html(design_context)
\ No newline at end of file
+    return await get_generator().generate_html(design_context, on_delta, use_cache)
+
+# Application-lifetime generator, so every clone reuses the same warm connection pool
+_generator: Optional[EnhancedLLMGenerator] = None
+
+def get_generator() -> EnhancedLLMGenerator:
+    """Shared generator, created on first use"""
+    global _generator
+    if _generator is None:
+        _generator = EnhancedLLMGenerator()
+    return _generator
+
+async def startup():
+    """Create and warm up the shared generator; call from the app's lifespan"""
+    await get_generator().warm_up()
+
+async def shutdown():
+    """Close the shared generator's connections; call from the app's lifespan"""
+    global _generator
+    if _generator is not None:
+        await _generator.aclose()
+        _generator = None
\ No newline at end of file
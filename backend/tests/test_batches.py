@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app import main
+
+
+def test_batch_job_cancelled_while_waiting_for_host_slot_is_not_run(monkeypatch):
+    ran = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(job_id, url, output_dir, force_refresh=False):
+            ran.append(job_id)
+            await release.wait()
+            main.job_store.update(job_id, status="completed", progress=100, message="done")
+
+        monkeypatch.setattr(main.job_queue, "handler", handler)
+        monkeypatch.setattr(main.batch_scheduler, "per_host_limit", 1)
+        await main.job_queue.start()
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/clone/batch", json={
+                    "urls": ["https://example.com/a", "https://example.com/b"],
+                })
+                batch_id = response.json()["id"]
+                batch = main.batch_scheduler.get(batch_id)
+                first, second = batch.job_ids
+                while not ran:
+                    await asyncio.sleep(0.01)
+
+                # The second job is still waiting for the host's only slot
+                response = await client.delete(f"/clone/{second}")
+                assert response.status_code == 200
+                assert response.json()["status"] == "cancelled"
+
+                release.set()
+                await batch.task
+                summary = (await client.get(f"/clone/batch/{batch_id}")).json()
+                second_status = (await client.get(f"/clone/{second}")).json()["status"]
+        finally:
+            await main.job_queue.stop()
+        return first, second_status, summary
+
+    first, second_status, summary = asyncio.run(run())
+
+    assert ran == [first]
+    assert second_status == "cancelled"
+    assert summary["status"] == "completed"
+    assert summary["completed"] == 1
+    assert summary["cancelled"] == 1
+    assert summary["failed"] == 0
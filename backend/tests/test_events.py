@@ -0,0 +1,36 @@
+from app.events import JobEventBus, PartialOutput
+
+
+def test_finished_artifact_stays_readable_until_cleared():
+    partial = PartialOutput()
+    partial.append("job", "css", 0, "body{")
+    partial.append("job", "css", 5, "color:red}")
+    partial.append("job", "html", 0, "<html>")
+
+    partial.finish("job", "css", "body{color:red}\n")
+
+    assert partial.get("job") == {"css": "body{color:red}\n", "html": "<html>"}
+    partial.clear("job")
+    assert partial.get("job") is None
+
+
+def test_delta_that_skips_ahead_is_rejected():
+    partial = PartialOutput()
+    assert partial.append("job", "html", 0, "<html>")
+    assert not partial.append("job", "html", 10, "<body>")
+    # Offset 0 restarts the artifact, e.g. after a retry
+    assert partial.append("job", "html", 0, "<!DOCTYPE html>")
+    assert partial.get("job") == {"html": "<!DOCTYPE html>"}
+
+
+def test_slow_subscriber_gets_a_resync_instead_of_a_gap():
+    bus = JobEventBus(max_pending=3)
+    queue = bus.subscribe("job")
+    for offset in range(5):
+        bus.publish("job", "delta", {"artifact": "html", "offset": offset, "text": "x"})
+
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+
+    # The backlog was replaced by a resync marker; only events after it are delivered
+    assert [e["event"] for e in events] == [JobEventBus.RESYNC, "delta", "delta"]
+    assert [e["data"]["offset"] for e in events[1:]] == [3, 4]
@@ -0,0 +1,132 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app import main
+from app.job_queue import JobQueue, QueueFullError
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+def test_cancelled_queued_job_is_skipped():
+    ran, skipped = [], []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(job_id):
+            ran.append(job_id)
+            await release.wait()
+
+        queue = JobQueue(handler, workers=1, on_skip=skipped.append)
+        await queue.start()
+        try:
+            queue.submit("a")
+            queue.submit("b")
+            await _until(lambda: ran)
+            assert queue.position("b") == 1
+            assert queue.cancel("b")
+            assert queue.depth == 0
+            release.set()
+            await _until(lambda: skipped)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert ran == ["a"]
+    assert skipped == ["b"]
+
+
+def test_cancelling_a_running_job_interrupts_it_and_frees_the_worker():
+    interrupted, ran = [], []
+
+    async def run():
+        async def handler(job_id):
+            ran.append(job_id)
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                interrupted.append(job_id)
+                raise
+
+        queue = JobQueue(handler, workers=1)
+        await queue.start()
+        try:
+            queue.submit("a")
+            queue.submit("b")
+            await _until(lambda: queue.in_flight)
+            assert queue.cancel("a")
+            await _until(lambda: "b" in ran)
+            assert not queue.cancel("missing")
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert interrupted[0] == "a"
+    assert ran == ["a", "b"]
+
+
+def test_submit_rejects_jobs_whose_estimated_wait_exceeds_the_slo():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(job_id):
+            await release.wait()
+
+        queue = JobQueue(handler, workers=1, slo_seconds=60, initial_job_seconds=60)
+        await queue.start()
+        try:
+            queue.submit("a")
+            await _until(lambda: queue.in_flight)
+            # One job ahead: a 60s wait is still within the SLO
+            assert queue.submit("b") == 1
+            with pytest.raises(QueueFullError) as excinfo:
+                queue.submit("c")
+            assert excinfo.value.retry_after == 60
+            assert queue.depth == 1
+        finally:
+            release.set()
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_submit_rejects_jobs_over_the_max_depth():
+    async def run():
+        async def handler(job_id):
+            await asyncio.sleep(60)
+
+        queue = JobQueue(handler, workers=1, max_depth=1, slo_seconds=10_000)
+        await queue.start()
+        try:
+            queue.submit("a")
+            with pytest.raises(QueueFullError):
+                queue.submit("b")
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_clone_endpoint_answers_429_with_retry_after_when_the_queue_is_full(monkeypatch):
+    async def run():
+        monkeypatch.setattr(main.job_queue, "max_depth", 0)
+        await main.job_queue.start()
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/clone", json={"url": "https://example.com/full"})
+        finally:
+            await main.job_queue.stop()
+
+    response = asyncio.run(run())
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "queue is full" in response.json()["detail"]
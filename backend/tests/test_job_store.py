@@ -0,0 +1,148 @@
+import sqlite3
+import time
+
+from app.job_store import HtmlSpill, MemoryJobStore, SqliteJobStore
+
+
+def _job(job_id, status="queued", html=None):
+    return {"id": job_id, "status": status, "progress": 0, "message": "", "html": html, "error": None}
+
+
+def _memory_store(tmp_path, **options):
+    return MemoryJobStore(HtmlSpill(str(tmp_path / "results"), threshold=100), **options)
+
+
+def _sqlite_store(tmp_path, **options):
+    return SqliteJobStore(str(tmp_path / "jobs.db"), HtmlSpill(str(tmp_path / "results"), threshold=100), **options)
+
+
+def _drain(store):
+    """Wait for the store's background writes to land."""
+    store._writer.submit(lambda: None).result()
+
+
+def test_memory_store_evicts_least_recently_used_finished_jobs(tmp_path):
+    store = _memory_store(tmp_path, max_jobs=4)
+    store.create(_job("running"))
+    for job_id in ("a", "b", "c"):
+        store.create(_job(job_id, status="completed"))
+    store.get("a")
+    store.create(_job("d", status="completed"))
+
+    # Running jobs are never evicted; "b" was the least recently used finished job
+    assert "running" in store
+    assert "b" not in store
+    assert all(job_id in store for job_id in ("a", "c", "d"))
+    store.close()
+
+
+def test_memory_store_expires_finished_jobs_after_ttl(tmp_path):
+    store = _memory_store(tmp_path, ttl_seconds=60)
+    store.create(_job("old", status="completed"))
+    store.create(_job("active"))
+    store._done["old"]["updated_at"] = time.time() - 120
+    store._active["active"]["updated_at"] = time.time() - 120
+
+    assert store.get("old") is None
+    assert store.get("active") is not None
+    store.close()
+
+
+def test_memory_store_spills_large_html_off_the_caller_thread(tmp_path):
+    store = _memory_store(tmp_path)
+    html = "<p>" * 100
+    store.create(_job("big", status="completed", html=html))
+    # Readable straight away, from memory until the file is written
+    assert store.get("big")["html"] == html
+    _drain(store)
+
+    job = store.get("big", include_html=False)
+    assert job["html"] is None
+    assert open(job["html_path"]).read() == html
+    assert store.get("big")["html"] == html
+    assert "".join(store.iter_html("big", chunk_size=7)) == html
+
+    store.delete("big")
+    assert not (tmp_path / job["html_path"]).exists()
+    store.close()
+
+
+def test_memory_store_removes_spills_of_exited_processes(tmp_path):
+    orphan = tmp_path / "results" / "memory-deadbeef"
+    orphan.mkdir(parents=True)
+    (orphan / "job.html").write_text("<html></html>")
+    live = _memory_store(tmp_path)
+
+    store = _memory_store(tmp_path)
+
+    assert not orphan.exists()
+    assert live.spill.spill_dir.exists()
+    store.close()
+    live.close()
+    assert not live.spill.spill_dir.exists()
+
+
+def test_sqlite_writes_do_not_wait_for_another_writer(tmp_path):
+    store = _sqlite_store(tmp_path)
+    store.create(_job("a"))
+    _drain(store)
+    other = sqlite3.connect(str(tmp_path / "jobs.db"), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        updated = store.update("a", status="completed", progress=100, message="done")
+        elapsed = time.monotonic() - started
+        # The caller sees its own write while the database is still locked
+        assert store.get("a")["status"] == "completed"
+        assert updated["message"] == "done"
+    finally:
+        other.execute("COMMIT")
+        other.close()
+    assert elapsed < 0.5
+    _drain(store)
+    store.close()
+
+    reopened = _sqlite_store(tmp_path)
+    assert reopened.get("a")["message"] == "done"
+    reopened.close()
+
+
+def test_sqlite_store_spills_and_evicts_by_count(tmp_path):
+    store = _sqlite_store(tmp_path, max_jobs=3)
+    html = "<div>" * 100
+    store.create(_job("big", status="completed", html=html))
+    _drain(store)
+    path = store.get("big", include_html=False)["html_path"]
+    assert open(path).read() == html
+    assert store.get("big")["html"] == html
+
+    for index in range(4):
+        store.create(_job(f"job-{index}", status="completed"))
+        time.sleep(0.01)
+    _drain(store)
+
+    # Only the oldest finished jobs go, and their spilled files with them
+    assert len(store) == 3
+    assert store.get("big") is None
+    assert not (tmp_path / path).exists()
+    store.close()
+
+
+def test_sqlite_restart_fails_only_jobs_of_exited_processes(tmp_path):
+    crashed = _sqlite_store(tmp_path)
+    crashed.create(_job("orphaned"))
+    _drain(crashed)
+    # Simulate a crash: the owner lock is released without a clean shutdown
+    crashed._owner_lock.close()
+
+    running = _sqlite_store(tmp_path)
+    running.create(_job("alive"))
+    _drain(running)
+
+    restarted = _sqlite_store(tmp_path)
+    _drain(restarted)
+
+    assert restarted.get("orphaned")["status"] == "failed"
+    assert restarted.get("alive")["status"] == "queued"
+    restarted.close()
+    running.close()
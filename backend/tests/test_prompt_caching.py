@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from app import llm_generator
+from app.instrumentation import JobMetrics, track_job
+from app.prompt_budget import count_tokens
+
+USAGE = {
+    "input_tokens": 40,
+    "output_tokens": 12,
+    "cache_read_input_tokens": 1200,
+    "cache_creation_input_tokens": 0,
+}
+
+
+async def _serve(handler, monkeypatch):
+    """Start a local /v1/messages stub and point the Claude client at it."""
+    app = web.Application()
+    app.router.add_post("/v1/messages", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(llm_generator, "CLAUDE_API_URL", f"http://127.0.0.1:{port}/v1/messages")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    return runner
+
+
+# A system prompt long enough for the Messages API to cache
+LONG_SYSTEM = "Reproduce the page's layout, palette and typography as closely as possible. " * 200
+
+
+def _messages(system=LONG_SYSTEM):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": "Title: Example"},
+    ]
+
+
+def _complete(handler, monkeypatch, messages, **kwargs):
+    async def run():
+        runner = await _serve(handler, monkeypatch)
+        try:
+            with track_job(JobMetrics()) as metrics:
+                text = await llm_generator.complete_messages(messages, max_tokens=100, **kwargs)
+        finally:
+            await llm_generator.close_session()
+            await runner.cleanup()
+        return text, metrics
+
+    return asyncio.run(run())
+
+
+def test_system_prefix_is_a_cache_breakpoint(monkeypatch):
+    requests = []
+
+    async def handler(request):
+        requests.append(await request.json())
+        return web.json_response({"content": [{"type": "text", "text": "<html></html>"}], "usage": USAGE})
+
+    text, metrics = _complete(handler, monkeypatch, _messages())
+
+    assert text == "<html></html>"
+    payload = requests[0]
+    assert payload["system"] == [{
+        "type": "text",
+        "text": LONG_SYSTEM,
+        "cache_control": {"type": "ephemeral"},
+    }]
+    assert payload["messages"] == [{"role": "user", "content": "Title: Example"}]
+    assert metrics.counters["llm_calls"] == 1
+    assert metrics.counters["prompt_tokens"] == 40
+    assert metrics.counters["completion_tokens"] == 12
+    assert metrics.counters["prompt_cache_read_tokens"] == 1200
+    assert metrics.counters["prompt_cache_write_tokens"] == 0
+
+
+def test_streamed_usage_records_cache_writes(monkeypatch):
+    events = [
+        {"type": "message_start", "message": {"usage": {
+            "input_tokens": 40, "output_tokens": 1,
+            "cache_read_input_tokens": 0, "cache_creation_input_tokens": 1200,
+        }}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "<html>"}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "</html>"}},
+        {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 12}},
+        {"type": "message_stop"},
+    ]
+
+    async def handler(request):
+        payload = await request.json()
+        assert payload["stream"] is True
+        assert payload["system"][0]["cache_control"] == {"type": "ephemeral"}
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for event in events:
+            await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+        await response.write_eof()
+        return response
+
+    deltas = []
+    text, metrics = _complete(
+        handler, monkeypatch, _messages(), on_delta=lambda offset, chunk: deltas.append((offset, chunk))
+    )
+
+    assert text == "<html></html>"
+    assert deltas == [(0, "<html>"), (6, "</html>")]
+    assert metrics.counters["prompt_tokens"] == 40
+    assert metrics.counters["completion_tokens"] == 12
+    assert metrics.counters["prompt_cache_read_tokens"] == 0
+    assert metrics.counters["prompt_cache_write_tokens"] == 1200
+
+
+def test_short_system_prompt_is_sent_without_cache_control(monkeypatch):
+    requests = []
+
+    async def handler(request):
+        requests.append(await request.json())
+        return web.json_response({"content": [{"type": "text", "text": "<html></html>"}], "usage": USAGE})
+
+    _complete(handler, monkeypatch, _messages(llm_generator.CLONE_INSTRUCTIONS))
+
+    # The built-in prefix is below the minimum, so marking it would only suggest a cache that never happens
+    assert count_tokens(llm_generator.CLONE_INSTRUCTIONS) < llm_generator.CACHE_MIN_TOKENS
+    assert requests[0]["system"] == [{"type": "text", "text": llm_generator.CLONE_INSTRUCTIONS}]
+
+
+def test_long_system_prompt_reaches_the_cacheable_minimum():
+    assert count_tokens(LONG_SYSTEM) >= llm_generator.CACHE_MIN_TOKENS
@@ -0,0 +1,40 @@
+import asyncio
+import os
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app import main
+from app.instrumentation import JobMetrics, StageStats
+
+
+def _get_ready():
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/ready")
+
+    return asyncio.run(run())
+
+
+def test_ready_when_idle(monkeypatch):
+    monkeypatch.setattr(main, "stage_stats", StageStats())
+    response = _get_ready()
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_slow_llm_stage_degrades_without_failing_the_probe(monkeypatch):
+    stats = StageStats()
+    metrics = JobMetrics()
+    metrics.add_stage("llm_html", main.READY_MAX_LLM_P95_SECONDS + 1)
+    stats.observe(metrics)
+    monkeypatch.setattr(main, "stage_stats", stats)
+
+    response = _get_ready()
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "degraded"
+    assert body["reasons"] == []
+    assert body["warnings"][0].startswith("llm_html p95 latency")
@@ -0,0 +1,80 @@
+import asyncio
+import gzip
+import os
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app import main, responses
+from app.responses import compute_etag, encode_chunks, encoded_etag, etag_matches, negotiate_encoding
+
+
+def test_negotiate_encoding_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", object())
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_negotiate_encoding_falls_back_to_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    assert negotiate_encoding("br, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding(None) is None
+
+
+def test_each_encoding_has_its_own_etag():
+    etag = compute_etag("<html></html>")
+    assert encoded_etag(etag, None) == etag
+    assert encoded_etag(etag, "gzip") == etag[:-1] + '-gzip"'
+    assert encoded_etag(etag, "gzip") != encoded_etag(etag, "br")
+
+
+def test_etag_matches():
+    etag = encoded_etag(compute_etag("<html></html>"), "gzip")
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(compute_etag("<html></html>"), etag)
+    assert not etag_matches(None, etag)
+
+
+def test_encode_chunks_gzip_round_trips():
+    data = b"".join(encode_chunks(["<html>", "<body>hi</body>", "</html>"], "gzip"))
+    assert gzip.decompress(data) == b"<html><body>hi</body></html>"
+
+
+def test_result_endpoint_revalidates_per_encoding(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    html = "<html><body>cloned</body></html>"
+    main.job_store.create({
+        "id": "etag-job", "status": "completed", "progress": 100, "message": "done",
+        "html": html, "html_etag": compute_etag(html), "error": None,
+    })
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/clone/etag-job/result", headers={"Accept-Encoding": "gzip"})
+            etag = first.headers["ETag"]
+            repeat = await client.get(
+                "/clone/etag-job/result", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+            )
+            identity = await client.get(
+                "/clone/etag-job/result", headers={"Accept-Encoding": "identity", "If-None-Match": etag}
+            )
+            return first, repeat, identity
+
+    try:
+        first, repeat, identity = asyncio.run(run())
+    finally:
+        main.job_store.delete("etag-job")
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].endswith('-gzip"')
+    assert first.text == html
+    assert repeat.status_code == 304
+    # The gzip validator does not match the uncompressed representation
+    assert identity.status_code == 200
+    assert identity.headers["ETag"] == compute_etag(html)
+    assert identity.text == html
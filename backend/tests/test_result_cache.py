@@ -0,0 +1,22 @@
+from app.result_cache import design_fingerprint
+
+
+def _scrape(markup: str, text: str = "Welcome"):
+    return {
+        "metadata": {"title": "Example", "color_scheme": ["#fff"]},
+        "layout": {
+            "main": {"content": text, "headings": [text], "links": [], "html": markup, "classes": ["hero"], "id": ""},
+            "navigation": [{"text": "Home", "href": "/"}],
+        },
+        "styles": {"inline": []},
+    }
+
+
+def test_fingerprint_ignores_markup_that_changes_per_fetch():
+    first = _scrape('<main><input name="csrf" value="a1"><p>Welcome</p></main>')
+    second = _scrape('<main><input name="csrf" value="b2"><p>Welcome</p></main>')
+    assert design_fingerprint(first) == design_fingerprint(second)
+
+
+def test_fingerprint_changes_with_the_content():
+    assert design_fingerprint(_scrape("<main></main>")) != design_fingerprint(_scrape("<main></main>", text="Hello"))
@@ -6,13 +6,19 @@ export interface CloneJob {
 
 export interface CloneStatus {
   id: string;
-  status: 'pending' | 'initializing' | 'scraping' | 'generating' | 'completed' | 'failed';
+  status: 'pending' | 'queued' | 'initializing' | 'scraping' | 'generating' | 'saving' | 'completed' | 'failed' | 'cancelled';
   progress: number;
   message: string;
   html?: string;
   error?: string;
+  queue_position?: number;
+  eta_seconds?: number;
+  result_url?: string;
+  partial?: Record<string, string>;
 }
 
+export const TERMINAL_STATUSES: ReadonlyArray<CloneStatus['status']> = ['completed', 'failed', 'cancelled'];
+
 export interface CloneRequest {
   url: string;
 }
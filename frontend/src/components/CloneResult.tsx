@@ -1,44 +1,113 @@
 import React, { useState, useEffect } from 'react';
-import { CloneStatus, ErrorResponse } from '../app/types';
+import { CloneStatus, ErrorResponse, TERMINAL_STATUSES } from '../app/types';
 
 interface CloneResultProps {
   jobId: string;
 }
 
+// Streamed output per artifact; 'combined' is the single-call response holding all sections
+type StreamedOutput = { html?: string; combined?: string };
+
+const SECTION_MARKER = /^[ \t]*={3,}[ \t]*(HTML|CSS|JS|JAVASCRIPT|END)[ \t]*={3,}[ \t]*$/gim;
+
+// The HTML section of a (possibly partial) single-call response, without markers, CSS or JS
+function combinedHtml(text: string): string {
+  const markers = Array.from(text.matchAll(SECTION_MARKER));
+  const start = markers.findIndex((m) => m[1].toUpperCase() === 'HTML');
+  if (start === -1) return '';
+  const from = markers[start].index! + markers[start][0].length;
+  const next = markers[start + 1];
+  return text.slice(from, next ? next.index : undefined).trim();
+}
+
 export default function CloneResult({ jobId }: CloneResultProps) {
   const [status, setStatus] = useState<CloneStatus | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [showCode, setShowCode] = useState(false);
   const [isFullscreen, setIsFullscreen] = useState(false);
   const [viewMode, setViewMode] = useState<'desktop' | 'tablet' | 'mobile'>('desktop');
+  const [streamed, setStreamed] = useState<StreamedOutput>({});
 
   useEffect(() => {
+    let cancelled = false;
+    let pollTimer: ReturnType<typeof setTimeout> | undefined;
+    let source: EventSource | null = null;
+
     const checkStatus = async () => {
       try {
-        const response = await fetch(`http://localhost:8000/clone/${jobId}`);
+        // Slim status poll; the generated HTML is fetched once from result_url
+        const response = await fetch(`http://localhost:8000/clone/${jobId}?include_html=false`);
         if (!response.ok) {
           const errorData = await response.json() as ErrorResponse;
           throw new Error(errorData.detail || 'Failed to fetch status');
         }
         const data = await response.json() as CloneStatus;
+        if (data.status === 'completed' && data.result_url) {
+          const result = await fetch(`http://localhost:8000${data.result_url}`);
+          if (result.ok) data.html = await result.text();
+        }
+        if (cancelled) return;
         setStatus(data);
 
-        // Continue polling if not completed or failed
-        if (data.status !== 'completed' && data.status !== 'failed') {
-          setTimeout(checkStatus, 1000);
+        // Continue polling until the job ends, backing off as the server suggests
+        if (!TERMINAL_STATUSES.includes(data.status)) {
+          const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+          pollTimer = setTimeout(checkStatus, retryAfter * 1000);
         }
       } catch (err) {
-        setError(err instanceof Error ? err.message : 'Unknown error');
+        if (!cancelled) setError(err instanceof Error ? err.message : 'Unknown error');
       }
     };
 
-    checkStatus();
+    if (typeof EventSource === 'undefined') {
+      checkStatus();
+    } else {
+      // Progress is pushed over Server-Sent Events; the final status is fetched once for the HTML
+      source = new EventSource(`http://localhost:8000/clone/${jobId}/events`);
+      source.addEventListener('status', (event) => {
+        const data = JSON.parse((event as MessageEvent).data) as CloneStatus;
+        // The first snapshot, and the one sent after the server dropped events for us, replaces the buffers
+        if (data.partial) setStreamed({ html: data.partial.html, combined: data.partial.combined });
+        if (TERMINAL_STATUSES.includes(data.status)) {
+          source?.close();
+          checkStatus();
+        } else {
+          setStatus(data);
+        }
+      });
+      // Token deltas of the HTML (or single-call response) being generated, kept in separate buffers
+      // since their offsets are independent; offsets let us skip anything out of order
+      source.addEventListener('delta', (event) => {
+        const delta = JSON.parse((event as MessageEvent).data) as { artifact: string; offset: number; text: string };
+        if (delta.artifact !== 'html' && delta.artifact !== 'combined') return;
+        const artifact = delta.artifact;
+        setStreamed((prev) => {
+          const current = prev[artifact] ?? '';
+          if (delta.offset === 0) return { ...prev, [artifact]: delta.text };
+          return delta.offset === current.length ? { ...prev, [artifact]: current + delta.text } : prev;
+        });
+      });
+      source.onerror = () => {
+        // Fall back to polling if the stream is unavailable
+        source?.close();
+        if (!cancelled) checkStatus();
+      };
+    }
+
+    return () => {
+      cancelled = true;
+      source?.close();
+      if (pollTimer) clearTimeout(pollTimer);
+    };
   }, [jobId]);
 
+  const streamedHtml = streamed.html || combinedHtml(streamed.combined ?? '');
+
   const getProgressColor = (): string => {
     if (!status) return 'bg-gray-500';
     if (status.status === 'failed') return 'bg-red-500';
     if (status.status === 'completed') return 'bg-green-500';
+    if (status.status === 'cancelled') return 'bg-gray-500';
     return 'bg-blue-500';
   };
 
@@ -57,6 +126,8 @@ export default function CloneResult({ jobId }: CloneResultProps) {
         return '✅';
       case 'failed':
         return '❌';
+      case 'cancelled':
+        return '🚫';
       default:
         return '⏳';
     }
@@ -109,6 +180,18 @@ export default function CloneResult({ jobId }: CloneResultProps) {
         </div>
       </div>
 
+      {/* Streaming Preview */}
+      {status.status === 'generating' && streamedHtml && (
+        <div className="bg-white dark:bg-gray-800 rounded-lg p-6 shadow-lg">
+          <h3 className="text-xl font-semibold text-gray-800 dark:text-white mb-4">
+            Generating HTML...
+          </h3>
+          <pre className="max-h-96 overflow-auto text-xs text-gray-700 dark:text-gray-300 whitespace-pre-wrap">
+            {streamedHtml}
+          </pre>
+        </div>
+      )}
+
       {/* Result Section */}
       {status.status === 'completed' && (
         <>